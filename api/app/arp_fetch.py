@@ -0,0 +1,193 @@
+# Purpose: Network fetch stage for ARP sources (pooled HTTP, bounded concurrency, conditional GETs).
+# Scope: internal-api ARP prepare; no DB or S3 access here, callers persist the results.
+# Dependencies: requests (shared Session + HTTPAdapter pool).
+# Notes: ARP_FETCH_CONCURRENCY bounds in-flight fetches per process (shared by all jobs);
+#        ARP_FETCH_PER_HOST keeps us polite to a single publisher: excess fetches for a busy host wait
+#        in a per-host queue and are only handed to the pool when a slot frees up, so no pool thread
+#        ever blocks on a host. Validators (ETag/Last-Modified) from a previous fetch turn an
+#        unchanged source into a 304 with no body.
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "ETI360/1.0"
+MAX_BYTES = 15 * 1024 * 1024
+
+_LOCK = threading.Lock()
+_SESSION: requests.Session | None = None
+_EXECUTOR: ThreadPoolExecutor | None = None
+# host -> fetches running on the pool; host -> fetches waiting for one of that host's slots.
+_HOST_ACTIVE: dict[str, int] = {}
+_HOST_QUEUES: dict[str, deque[tuple[Future[FetchResult], dict[str, str]]]] = {}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def fetch_concurrency() -> int:
+    return max(1, min(_env_int("ARP_FETCH_CONCURRENCY", 8), 64))
+
+
+def fetch_per_host() -> int:
+    return max(1, _env_int("ARP_FETCH_PER_HOST", 2))
+
+
+def _timeout() -> tuple[float, float]:
+    return (10.0, float(max(1, _env_int("ARP_FETCH_TIMEOUT_SECONDS", 45))))
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    source_id: str
+    url: str
+    status: str  # "ok" | "not_modified" | "error"
+    raw: bytes = b""
+    header_content_type: str = ""
+    etag: str = ""
+    last_modified: str = ""
+    error: str = ""
+
+
+def _session() -> requests.Session:
+    global _SESSION
+    with _LOCK:
+        if _SESSION is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=32, pool_maxsize=fetch_concurrency())
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            s.headers["User-Agent"] = USER_AGENT
+            _SESSION = s
+        return _SESSION
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=fetch_concurrency(), thread_name_prefix="eti360-arp-fetch")
+        return _EXECUTOR
+
+
+def fetch_source(*, source_id: str, url: str, etag: str = "", last_modified: str = "") -> FetchResult:
+    """
+    GET one source. Never raises: failures come back as status="error" with a message.
+    """
+    u = (url or "").strip()
+    parsed = urlparse(u) if u else None
+    if not parsed or parsed.scheme not in {"http", "https"} or not parsed.netloc:
+        msg = f"Invalid source URL (must start with http:// or https://): {u or '(empty)'}"
+        return FetchResult(source_id=source_id, url=u, status="error", error=msg)
+
+    headers: dict[str, str] = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        with _session().get(u, timeout=_timeout(), headers=headers, stream=True) as resp:
+            if resp.status_code == 304:
+                return FetchResult(
+                    source_id=source_id,
+                    url=u,
+                    status="not_modified",
+                    etag=str(resp.headers.get("ETag") or etag),
+                    last_modified=str(resp.headers.get("Last-Modified") or last_modified),
+                )
+            resp.raise_for_status()
+            buf = bytearray()
+            for chunk in resp.iter_content(chunk_size=64 * 1024):
+                buf.extend(chunk)
+                if len(buf) > MAX_BYTES:
+                    raise RuntimeError(f"Source is larger than {MAX_BYTES // (1024 * 1024)} MB")
+            return FetchResult(
+                source_id=source_id,
+                url=u,
+                status="ok",
+                raw=bytes(buf),
+                header_content_type=str(resp.headers.get("Content-Type") or ""),
+                etag=str(resp.headers.get("ETag") or ""),
+                last_modified=str(resp.headers.get("Last-Modified") or ""),
+            )
+    except Exception as e:
+        return FetchResult(source_id=source_id, url=u, status="error", error=str(e) or type(e).__name__)
+
+
+def _host_of(url: str) -> str:
+    try:
+        return (urlparse((url or "").strip()).netloc or "").lower()
+    except ValueError:
+        return ""
+
+
+def _run_for_host(host: str, fut: Future[FetchResult], kwargs: dict[str, str]) -> None:
+    # Runs on the pool while holding one of `host`'s slots, then passes the slot on.
+    try:
+        fut.set_result(fetch_source(**kwargs))
+    finally:
+        with _LOCK:
+            nxt = _next_for_host(host)
+        if nxt is not None:
+            # Back of the pool queue, so a busy host never jumps ahead of other work.
+            _executor().submit(_run_for_host, host, *nxt)
+
+
+def _next_for_host(host: str) -> tuple[Future[FetchResult], dict[str, str]] | None:
+    # Caller holds _LOCK. Skips fetches whose caller cancelled them while queued.
+    queue = _HOST_QUEUES.get(host)
+    while queue:
+        fut, kwargs = queue.popleft()
+        if fut.set_running_or_notify_cancel():
+            return fut, kwargs
+    _HOST_QUEUES.pop(host, None)
+    active = _HOST_ACTIVE.get(host, 0) - 1
+    if active > 0:
+        _HOST_ACTIVE[host] = active
+    else:
+        _HOST_ACTIVE.pop(host, None)
+    return None
+
+
+def fetch_many(items: Iterable[tuple[str, str, str, str]]) -> dict[str, Future[FetchResult]]:
+    """
+    Start fetching (source_id, url, etag, last_modified) items on the shared pool.
+    Returns source_id -> Future so callers can persist each result as soon as it is ready.
+
+    A host already using ARP_FETCH_PER_HOST slots gets the extra items queued; each finished fetch
+    submits its host's next queued item.
+    """
+    pool = _executor()
+    per_host = fetch_per_host()
+    out: dict[str, Future[FetchResult]] = {}
+    for sid, url, etag, last_modified in items:
+        kwargs = {"source_id": sid, "url": url, "etag": etag, "last_modified": last_modified}
+        fut: Future[FetchResult] = Future()
+        out[sid] = fut
+        host = _host_of(url)
+        if not host:
+            # Invalid URL: fetch_source reports it without touching the network.
+            fut.set_running_or_notify_cancel()
+            fut.set_result(fetch_source(**kwargs))
+            continue
+        with _LOCK:
+            if _HOST_ACTIVE.get(host, 0) >= per_host:
+                _HOST_QUEUES.setdefault(host, deque()).append((fut, kwargs))
+                continue
+            _HOST_ACTIVE[host] = _HOST_ACTIVE.get(host, 0) + 1
+        fut.set_running_or_notify_cancel()
+        pool.submit(_run_for_host, host, fut, kwargs)
+    return out
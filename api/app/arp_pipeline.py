@@ -2,13 +2,16 @@ from __future__ import annotations
 
 import hashlib
 import json
+import math
 import re
 from dataclasses import dataclass
 from html.parser import HTMLParser
 from io import BytesIO
-from typing import Any
+from typing import Any, Iterable
 
-from collections import Counter, defaultdict
+from collections import Counter
+
+import numpy as np
 
 try:
     from pypdf import PdfReader  # type: ignore[import-not-found]
@@ -24,54 +27,113 @@ def tokenize(text: str) -> list[str]:
 
 
 class BM25Index:
+    """
+    Okapi BM25 over an inverted index: term -> (doc positions, term frequencies).
+
+    Adds are O(tokens); avgdl is kept as a running total and idf/NumPy postings are cached until the
+    next add. Queries touch only the postings of the query terms and rank with argpartition.
+    Scores and ordering (ties keep insertion order) match the original per-document scorer.
+    """
+
     def __init__(self, *, k1: float = 1.5, b: float = 0.75) -> None:
         self.k1 = k1
         self.b = b
-        self._docs: list[dict[str, object]] = []
-        self._df: dict[str, int] = defaultdict(int)
-        self._avgdl: float = 0.0
+        self._ids: list[str] = []
+        self._payloads: list[dict[str, object]] = []
+        self._dl: list[int] = []
+        self._total_dl = 0
+        self._postings: dict[str, tuple[list[int], list[int]]] = {}
+        # Derived on first query after an add.
+        self._idf_cache: dict[str, float] = {}
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._dl_arr: np.ndarray | None = None
+
+    @classmethod
+    def build(
+        cls, docs: Iterable[tuple[str, str, dict[str, object] | None]], *, k1: float = 1.5, b: float = 0.75
+    ) -> BM25Index:
+        """
+        Index (doc_id, text, payload) tuples in one pass.
+        """
+        idx = cls(k1=k1, b=b)
+        for doc_id, text, payload in docs:
+            idx.add(doc_id, text, payload=payload)
+        return idx
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def _avgdl(self) -> float:
+        return self._total_dl / max(1, len(self._ids))
 
     def add(self, doc_id: str, text: str, *, payload: dict[str, object] | None = None) -> None:
         tokens = tokenize(text)
-        tf = Counter(tokens)
-        dl = len(tokens)
-        for t in tf.keys():
-            self._df[t] += 1
-        self._docs.append({"id": doc_id, "tf": tf, "dl": dl, "payload": payload or {}})
-        self._avgdl = sum(int(d["dl"]) for d in self._docs) / max(1, len(self._docs))
+        pos = len(self._ids)
+        for term, f in Counter(tokens).items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = ([], [])
+                self._postings[term] = posting
+            posting[0].append(pos)
+            posting[1].append(f)
+        self._ids.append(doc_id)
+        self._payloads.append(payload or {})
+        self._dl.append(len(tokens))
+        self._total_dl += len(tokens)
+        if self._idf_cache or self._arrays or self._dl_arr is not None:
+            self._idf_cache.clear()
+            self._arrays.clear()
+            self._dl_arr = None
 
     def _idf(self, term: str) -> float:
-        import math
-
-        n = len(self._docs)
-        df = self._df.get(term, 0)
-        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+        idf = self._idf_cache.get(term)
+        if idf is None:
+            n = len(self._ids)
+            posting = self._postings.get(term)
+            df = len(posting[0]) if posting else 0
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            self._idf_cache[term] = idf
+        return idf
+
+    def _term_arrays(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            posting = self._postings.get(term)
+            if not posting:
+                return None
+            arrays = (np.asarray(posting[0], dtype=np.int64), np.asarray(posting[1], dtype=np.float64))
+            self._arrays[term] = arrays
+        return arrays
 
     def query(self, q: str, *, top_k: int = 10) -> list[dict[str, object]]:
         q_terms = tokenize(q)
-        if not q_terms or not self._docs:
+        n = len(self._ids)
+        if not q_terms or not n or top_k <= 0:
             return []
 
-        scores: list[tuple[float, dict[str, object]]] = []
-        for d in self._docs:
-            tf: Counter[str] = d["tf"]  # type: ignore[assignment]
-            dl = int(d["dl"])
-            score = 0.0
-            for term in q_terms:
-                f = tf.get(term, 0)
-                if not f:
-                    continue
-                idf = self._idf(term)
-                denom = f + self.k1 * (1 - self.b + self.b * (dl / (self._avgdl or 1.0)))
-                score += idf * (f * (self.k1 + 1)) / (denom or 1.0)
-            if score:
-                scores.append((score, d))
-
-        scores.sort(key=lambda x: x[0], reverse=True)
-        out: list[dict[str, object]] = []
-        for score, d in scores[:top_k]:
-            out.append({"score": score, "id": d["id"], "payload": d["payload"]})
-        return out
+        if self._dl_arr is None:
+            self._dl_arr = np.asarray(self._dl, dtype=np.float64)
+        # Same operation order as the scalar formula, so scores are bit-identical.
+        norm = self.k1 * (1 - self.b + self.b * (self._dl_arr / (self._avgdl or 1.0)))
+        scores = np.zeros(n, dtype=np.float64)
+        for term in q_terms:  # repeated query terms count again, as before
+            arrays = self._term_arrays(term)
+            if arrays is None:
+                continue
+            docs, tf = arrays
+            scores[docs] += self._idf(term) * (tf * (self.k1 + 1)) / (tf + norm[docs])
+
+        cand = np.flatnonzero(scores)
+        if cand.size > top_k:
+            # Keep everything tied with the k-th score so the tie-break below stays exact.
+            kth = -np.partition(-scores[cand], top_k - 1)[top_k - 1]
+            cand = cand[scores[cand] >= kth]
+        order = np.lexsort((cand, -scores[cand]))[:top_k]
+        return [
+            {"score": float(scores[i]), "id": self._ids[i], "payload": self._payloads[i]}
+            for i in cand[order].tolist()
+        ]
 
 
 @dataclass(frozen=True)
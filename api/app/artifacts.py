@@ -0,0 +1,142 @@
+# Purpose: Content-addressed artifact store on top of S3 (one immutable object per sha256).
+# Scope: internal-api shared (weather/daylight PNGs, travel segment maps, ARP raw docs, uploaded documents).
+# Dependencies: psycopg (registry tables in OPS_SCHEMA), app.weather.s3 (boto3).
+# Notes: Blobs live under `<prefix>blobs/sha256/<ab>/<digest>.<ext>` with immutable cache headers;
+#        a blob is identified by (bucket, sha256, normalized MIME) so each type keeps its Content-Type.
+#        `artifacts` records which blobs exist; `artifact_refs` maps logical names to the current blob.
+#        Re-storing identical bytes skips the S3 PUT (and, once seen, the registry lookup too).
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from hashlib import sha256
+
+import psycopg
+
+from app.cache import TTLCache
+from app.weather.s3 import put_bytes
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_EXT_BY_MIME = {
+    "image/png": "png",
+    "application/pdf": "pdf",
+    "text/html": "html",
+    "text/markdown": "md",
+    "text/plain": "txt",
+    "application/json": "json",
+    "text/csv": "csv",
+}
+
+# (bucket, digest, mime) -> key, for blobs known to exist in S3 + the registry.
+_KNOWN: TTLCache[str] = TTLCache(max_items=50_000, ttl_seconds=24 * 3600)
+
+
+@dataclass(frozen=True)
+class Blob:
+    sha256: str
+    s3_bucket: str
+    s3_key: str
+    bytes: int
+    content_type: str
+    uploaded: bool  # False when identical bytes were already stored
+
+
+def normalize_mime(content_type: str) -> str:
+    return (content_type or "").split(";", 1)[0].strip().lower() or "application/octet-stream"
+
+
+def blob_key(*, prefix: str, digest: str, content_type: str) -> str:
+    mime = normalize_mime(content_type)
+    ext = _EXT_BY_MIME.get(mime)
+    if ext is None:
+        # Unmapped types share the .bin extension; tag the key with the MIME so they never share an object.
+        ext = f"{sha256(mime.encode('utf-8')).hexdigest()[:8]}.bin"
+    key = f"{prefix}blobs/sha256/{digest[:2]}/{digest}.{ext}"
+    return re.sub(r"//+", "/", key)
+
+
+def lookup_blob(cur: psycopg.Cursor, *, schema: str, bucket: str, digest: str, content_type: str) -> str:
+    """
+    Returns the stored key for (bucket, digest, MIME), or "" if the blob hasn't been stored as that type yet.
+    """
+    mime = normalize_mime(content_type)
+    known = _KNOWN.get((bucket, digest, mime))
+    if known is not None:
+        return known
+    cur.execute(
+        f'SELECT s3_key FROM "{schema}".artifacts WHERE s3_bucket=%s AND sha256=%s AND mime=%s;',
+        (bucket, digest, mime),
+    )
+    row = cur.fetchone()
+    if not row:
+        return ""
+    key = str(row[0])
+    _KNOWN.set((bucket, digest, mime), key)
+    return key
+
+
+def register_blob(
+    cur: psycopg.Cursor,
+    *,
+    schema: str,
+    bucket: str,
+    key: str,
+    digest: str,
+    size: int,
+    content_type: str,
+    name: str = "",
+) -> None:
+    """
+    Records an uploaded blob and (optionally) points the logical `name` at it. Caller commits.
+    """
+    mime = normalize_mime(content_type)
+    cur.execute(
+        f"""
+        INSERT INTO "{schema}".artifacts (sha256, s3_bucket, s3_key, bytes, content_type, mime)
+        VALUES (%s,%s,%s,%s,%s,%s)
+        ON CONFLICT (s3_bucket, sha256, mime) DO NOTHING;
+        """,
+        (digest, bucket, key, int(size), content_type or "", mime),
+    )
+    if name:
+        cur.execute(
+            f"""
+            INSERT INTO "{schema}".artifact_refs (name, sha256, s3_bucket, s3_key)
+            VALUES (%s,%s,%s,%s)
+            ON CONFLICT (name) DO UPDATE
+              SET sha256=EXCLUDED.sha256, s3_bucket=EXCLUDED.s3_bucket, s3_key=EXCLUDED.s3_key, updated_at=now()
+            WHERE "{schema}".artifact_refs.sha256 IS DISTINCT FROM EXCLUDED.sha256;
+            """,
+            (name, digest, bucket, key),
+        )
+    _KNOWN.set((bucket, digest, mime), key)
+
+
+def store_blob(
+    cur: psycopg.Cursor,
+    *,
+    schema: str,
+    region: str,
+    bucket: str,
+    prefix: str,
+    body: bytes,
+    content_type: str,
+    name: str = "",
+    digest: str = "",
+) -> Blob:
+    """
+    Store `body` once under its content address and return where it lives.
+
+    The S3 PUT is skipped when the same bytes are already registered for `bucket` as the same type. Caller commits.
+    """
+    digest = digest or sha256(body).hexdigest()
+    ct = content_type or "application/octet-stream"
+    key = lookup_blob(cur, schema=schema, bucket=bucket, digest=digest, content_type=ct)
+    uploaded = False
+    if not key:
+        key = blob_key(prefix=prefix, digest=digest, content_type=ct)
+        put_bytes(region=region, bucket=bucket, key=key, body=body, content_type=ct, cache_control=IMMUTABLE_CACHE_CONTROL)
+        uploaded = True
+    register_blob(cur, schema=schema, bucket=bucket, key=key, digest=digest, size=len(body), content_type=ct, name=name)
+    return Blob(sha256=digest, s3_bucket=bucket, s3_key=key, bytes=len(body), content_type=ct, uploaded=uploaded)
@@ -0,0 +1,67 @@
+# Purpose: Small thread-safe in-process LRU cache with per-entry TTL.
+# Scope: internal-api shared (session lookups, presigned URLs, other hot-path memoization).
+# Dependencies: stdlib only.
+# Notes: Per-process only; callers own cross-instance invalidation (short TTLs / NOTIFY).
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    def __init__(self, *, max_items: int, ttl_seconds: float) -> None:
+        self.max_items = max(1, int(max_items))
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> V | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value = item
+            if expires <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, *, ttl_seconds: float | None = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, pred: Callable[[Hashable, V], bool]) -> int:
+        with self._lock:
+            doomed = [k for k, (_, v) in self._data.items() if pred(k, v)]
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._data), "max_items": self.max_items, "ttl_seconds": self.ttl_seconds, "hits": self.hits, "misses": self.misses}
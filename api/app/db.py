@@ -0,0 +1,462 @@
+# Purpose: Process-wide Postgres connection pool shared by web handlers and the jobs worker.
+# Scope: internal-api shared (every module that talks to DATABASE_URL).
+# Dependencies: psycopg, psycopg_pool.
+# Notes: Sized via DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE; acquire timeout via DB_POOL_TIMEOUT_SECONDS.
+#        `run_blocking` lets `async def` handlers do DB work without stalling the event loop.
+#        `request_session` (app-level dependency) lends one connection per HTTP request;
+#        `release_request_connection` hands it back before slow non-DB work (S3, LLM, uploads).
+#        `listen`/`notify` multiplex Postgres LISTEN channels over one dedicated connection.
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, TypeVar
+
+import psycopg
+from fastapi import Request
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+# Upper bounds (ms) for the acquire wait-time histogram; the last bucket is open-ended.
+_WAIT_BUCKETS_MS: tuple[float, ...] = (1.0, 5.0, 25.0, 100.0, 500.0, 2000.0, 10000.0)
+
+_POOL: ConnectionPool | None = None
+_POOL_LOCK = threading.Lock()
+_EXECUTOR: ThreadPoolExecutor | None = None
+
+T = TypeVar("T")
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except Exception:
+        return default
+
+
+def pool_min_size() -> int:
+    return max(0, _env_int("DB_POOL_MIN_SIZE", 1))
+
+
+def pool_max_size() -> int:
+    return max(1, pool_min_size(), _env_int("DB_POOL_MAX_SIZE", 10))
+
+
+def pool_timeout_seconds() -> float:
+    return max(0.1, _env_float("DB_POOL_TIMEOUT_SECONDS", 15.0))
+
+
+def executor_workers() -> int:
+    # Default to the pool size: more threads than connections would just queue on the pool.
+    return max(1, _env_int("DB_EXECUTOR_WORKERS", pool_max_size()))
+
+
+class _AcquireStats:
+    """
+    Acquire-side counters that psycopg_pool does not expose (in-use count, wait histogram).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.buckets = [0] * (len(_WAIT_BUCKETS_MS) + 1)
+
+    def begin_wait(self) -> None:
+        with self._lock:
+            self.waiting += 1
+
+    def end_wait(self, *, wait_ms: float, ok: bool, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waiting -= 1
+            if not ok:
+                if timed_out:
+                    self.timeouts += 1
+                return
+            self.in_use += 1
+            self.acquired += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            for i, upper in enumerate(_WAIT_BUCKETS_MS):
+                if wait_ms <= upper:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            labels = [f"le_{int(b)}ms" for b in _WAIT_BUCKETS_MS] + [f"gt_{int(_WAIT_BUCKETS_MS[-1])}ms"]
+            return {
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": (self.wait_ms_total / self.acquired) if self.acquired else 0.0,
+                "wait_ms_max": self.wait_ms_max,
+                "wait_ms_histogram": dict(zip(labels, self.buckets)),
+            }
+
+
+_STATS = _AcquireStats()
+
+
+def get_pool(conninfo: str) -> ConnectionPool:
+    """
+    Return the process-wide pool, opening it on first use.
+
+    The pool is created lazily so importing this module never touches the network.
+    """
+    global _POOL
+    pool = _POOL
+    if pool is not None:
+        return pool
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConnectionPool(
+                conninfo,
+                min_size=pool_min_size(),
+                max_size=pool_max_size(),
+                timeout=pool_timeout_seconds(),
+                # Render Postgres drops idle TCP connections; recycle before that happens.
+                max_idle=_env_float("DB_POOL_MAX_IDLE_SECONDS", 300.0),
+                max_lifetime=_env_float("DB_POOL_MAX_LIFETIME_SECONDS", 3600.0),
+                check=ConnectionPool.check_connection,
+                configure=_configure_connection,
+                name="eti360-db",
+                open=True,
+            )
+        return _POOL
+
+
+class RequestSession:
+    """
+    One pooled connection lent to every `_connect()` block of a single HTTP request.
+
+    The connection is checked out lazily on first use and returned when the request ends, or
+    earlier via `release()` before the handler does S3/LLM/upload work. Each `with` block still
+    commits/rolls back on exit, exactly like a fresh connection. Nested or concurrent use
+    (another thread, or a block opened inside another) gets its own pooled connection so
+    transactions never interleave.
+    """
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.connections = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        self._cm: Any = None
+        self._conn: psycopg.Connection | None = None
+
+    @property
+    def holding(self) -> bool:
+        return self._conn is not None
+
+    def try_lend(self, conninfo: str) -> AbstractContextManager[psycopg.Connection] | None:
+        if self.closed or not self._lock.acquire(blocking=False):
+            return None
+        return self._lend(conninfo)
+
+    @contextmanager
+    def _lend(self, conninfo: str) -> Iterator[psycopg.Connection]:
+        try:
+            if self._conn is not None and (self._conn.closed or self._conn.broken):
+                # Hand the dead connection back so the pool discards it, then borrow a fresh one.
+                self._return()
+            if self._conn is None:
+                cm = _pooled_connection(conninfo)
+                self._conn = cm.__enter__()
+                self._cm = cm
+                self.connections += 1
+            conn = self._conn
+            try:
+                yield conn
+            except BaseException:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            else:
+                conn.commit()
+        finally:
+            self._lock.release()
+
+    def _return(self) -> None:
+        cm, self._cm, self._conn = self._cm, None, None
+        if cm is not None:
+            try:
+                cm.__exit__(None, None, None)
+            except Exception:
+                pass
+
+    def release(self, *, done: bool = False) -> None:
+        """
+        Give the lent connection back to the pool; the next `_connect()` borrows again lazily.
+
+        `done=True` also stops lending for the rest of the request (e.g. long-lived streams).
+        No-op for the connection while a block is using it.
+        """
+        if done:
+            self.closed = True
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._return()
+        finally:
+            self._lock.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self._return()
+
+
+_REQUEST_SESSION: contextvars.ContextVar[RequestSession | None] = contextvars.ContextVar("eti360_db_session", default=None)
+
+
+def current_session() -> RequestSession | None:
+    return _REQUEST_SESSION.get()
+
+
+class _CountingCursor(psycopg.Cursor):
+    """
+    Cursor that attributes every statement to the active request session (if any).
+    """
+
+    def execute(self, query: Any, params: Any = None, **kwargs: Any) -> Any:
+        sess = _REQUEST_SESSION.get()
+        if sess is not None:
+            sess.queries += 1
+        return super().execute(query, params, **kwargs)
+
+    def executemany(self, query: Any, params_seq: Any, **kwargs: Any) -> None:
+        sess = _REQUEST_SESSION.get()
+        if sess is not None:
+            sess.queries += 1
+        return super().executemany(query, params_seq, **kwargs)
+
+
+def _configure_connection(conn: psycopg.Connection) -> None:
+    conn.cursor_factory = _CountingCursor
+
+
+@contextmanager
+def _pooled_connection(conninfo: str) -> Iterator[psycopg.Connection]:
+    pool = get_pool(conninfo)
+    _STATS.begin_wait()
+    t0 = time.perf_counter()
+    try:
+        cm = pool.connection()
+        conn = cm.__enter__()
+    except BaseException as e:
+        _STATS.end_wait(wait_ms=(time.perf_counter() - t0) * 1000.0, ok=False, timed_out=isinstance(e, PoolTimeout))
+        raise
+    _STATS.end_wait(wait_ms=(time.perf_counter() - t0) * 1000.0, ok=True)
+    try:
+        try:
+            yield conn
+        except BaseException as e:
+            if not cm.__exit__(type(e), e, e.__traceback__):
+                raise
+        else:
+            cm.__exit__(None, None, None)
+    finally:
+        _STATS.release()
+
+
+@contextmanager
+def connection(conninfo: str) -> Iterator[psycopg.Connection]:
+    """
+    Borrow a pooled connection (or the current request's shared one).
+
+    Same semantics as `with psycopg.connect(...) as conn`: commits on clean exit,
+    rolls back on exception, then returns the connection to the pool.
+    """
+    sess = _REQUEST_SESSION.get()
+    lent = sess.try_lend(conninfo) if sess is not None else None
+    if lent is not None:
+        with lent as conn:
+            yield conn
+        return
+    if sess is not None:
+        sess.connections += 1
+    with _pooled_connection(conninfo) as conn:
+        yield conn
+
+
+async def request_session(request: Request) -> AsyncIterator[RequestSession]:
+    """
+    App-level FastAPI dependency: one lazily-borrowed connection per request.
+
+    Query/connection counts are left on `request.state.db_session` for the response headers.
+    """
+    sess = RequestSession()
+    request.state.db_session = sess
+    token = _REQUEST_SESSION.set(sess)
+    try:
+        yield sess
+    finally:
+        _REQUEST_SESSION.reset(token)
+        if sess.holding:
+            await run_blocking(sess.close)
+        else:
+            sess.closed = True
+
+
+def release_request_connection(*, done: bool = False) -> None:
+    """
+    Return the current request's lent connection to the pool (see `RequestSession.release`).
+
+    Call it before S3/LLM/upload work so a slow call never pins a pool slot; sync handlers call
+    it directly, `async def` handlers via `await run_blocking(db.release_request_connection)`.
+    """
+    sess = _REQUEST_SESSION.get()
+    if sess is not None:
+        sess.release(done=done)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    ex = _EXECUTOR
+    if ex is not None:
+        return ex
+    with _POOL_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=executor_workers(), thread_name_prefix="eti360-db")
+        return _EXECUTOR
+
+
+async def run_blocking(fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """
+    Run blocking (psycopg / CPU) work on the bounded DB executor from an `async def` handler.
+
+    Context variables are copied so request-scoped state follows the call into the thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_executor(), call)
+
+
+_CHANNEL_RE = re.compile(r"^[a-z_][a-z0-9_]{0,62}$")
+_LISTENERS: dict[str, list[Callable[[str | None], None]]] = {}
+_LISTEN_LOCK = threading.Lock()
+_LISTEN_THREAD: threading.Thread | None = None
+
+
+def listen(conninfo: str, channel: str, callback: Callable[[str | None], None]) -> None:
+    """
+    Subscribe `callback(payload)` to a Postgres NOTIFY channel.
+
+    All channels share one long-lived autocommit connection (outside the pool) and one
+    daemon thread. After every (re)connect each callback is invoked with `None`, meaning
+    "notifications may have been missed; resync".
+    """
+    global _LISTEN_THREAD
+    if not _CHANNEL_RE.match(channel or ""):
+        raise ValueError(f"Invalid channel name: {channel!r}")
+    with _LISTEN_LOCK:
+        _LISTENERS.setdefault(channel, []).append(callback)
+        if _LISTEN_THREAD and _LISTEN_THREAD.is_alive():
+            return
+        t = threading.Thread(target=_listen_loop, args=(conninfo,), name="eti360-db-listen", daemon=True)
+        t.start()
+        _LISTEN_THREAD = t
+
+
+def notify(cur: psycopg.Cursor, channel: str, payload: str = "") -> None:
+    """
+    Queue a NOTIFY on the caller's transaction (delivered to listeners on commit).
+    """
+    cur.execute("SELECT pg_notify(%s, %s);", (channel, payload))
+
+
+def _dispatch(channel: str, payload: str | None) -> None:
+    with _LISTEN_LOCK:
+        callbacks = list(_LISTENERS.get(channel) or [])
+    for cb in callbacks:
+        try:
+            cb(payload)
+        except Exception as e:
+            print(f"[db.listen] {channel} callback error: {e}")
+
+
+def _listen_loop(conninfo: str) -> None:
+    while True:
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as conn:
+                listening: set[str] = set()
+                while True:
+                    with _LISTEN_LOCK:
+                        wanted = [c for c in _LISTENERS if c not in listening]
+                    for ch in wanted:
+                        conn.execute(f'LISTEN "{ch}";')
+                        listening.add(ch)
+                        _dispatch(ch, None)
+                    for n in conn.notifies(timeout=1.0):
+                        _dispatch(n.channel, n.payload)
+        except Exception as e:
+            print(f"[db.listen] connection lost: {e}")
+            time.sleep(2.0)
+
+
+def pool_stats() -> dict[str, Any]:
+    """
+    Pool sizing diagnostics (safe to share; no connection strings).
+    """
+    out: dict[str, Any] = {
+        "configured": {
+            "min_size": pool_min_size(),
+            "max_size": pool_max_size(),
+            "timeout_seconds": pool_timeout_seconds(),
+            "executor_workers": executor_workers(),
+        },
+        "open": _POOL is not None,
+    }
+    out.update(_STATS.snapshot())
+    pool = _POOL
+    if pool is not None:
+        # psycopg_pool's own counters (pool_size, pool_available, requests_waiting, ...).
+        out["pool"] = dict(pool.get_stats())
+    return out
+
+
+def close_pool() -> None:
+    global _POOL, _EXECUTOR
+    with _POOL_LOCK:
+        pool = _POOL
+        ex = _EXECUTOR
+        _POOL = None
+        _EXECUTOR = None
+    if ex is not None:
+        ex.shutdown(wait=False)
+    if pool is not None:
+        pool.close()
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import csv
+import functools
+import hmac
 import io
 import json
 import os
@@ -11,6 +14,9 @@ import time
 import uuid
 import zipfile
 from base64 import b64decode, b64encode, urlsafe_b64decode, urlsafe_b64encode
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager
 from datetime import datetime, timedelta, timezone
 from hashlib import pbkdf2_hmac, sha256
 from io import StringIO
@@ -24,11 +30,12 @@ import bleach
 import markdown as mdlib
 import psycopg
 import requests
-from fastapi import FastAPI, File, Form, Header, HTTPException, Query, Request, Response, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi import Depends, FastAPI, File, Form, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
+from app.arp_fetch import FetchResult, fetch_concurrency, fetch_many
 from app.arp_pipeline import (
     ARP_EXTRACT_SCHEMA,
     ARP_EXTRACT_SYSTEM,
@@ -44,6 +51,9 @@ from app.arp_pipeline import (
     tokenize,
     validate_arp_json,
 )
+from app import db
+from app.artifacts import IMMUTABLE_CACHE_CONTROL, Blob, blob_key, lookup_blob, register_blob, store_blob
+from app.cache import TTLCache
 from app.geo import CONTINENT_ORDER, continent_for_country
 from app.icons import IconFormInput, IconIntentSpec, build_icon_prompt, classify_icon_intent, render_icon_png, sha256_json
 from app.icons.prompt_builder import ETI_ICON_PRIMARY_HEX, FIXED_GENERATION_PARAMS
@@ -51,14 +61,40 @@ from app.weather.perplexity import fetch_monthly_weather_normals
 from app.weather.daylight_chart import DaylightInputs, compute_daylight_summary, render_daylight_chart
 from app.weather.llm_usage import estimate_cost_usd
 from app.weather.openai_chat import OpenAIResult, chat_json, chat_text
-from app.weather.s3 import get_bytes, get_s3_config, presign_get, presign_get_inline, put_bytes, put_png
+from app.weather.s3 import (
+    MULTIPART_MIN_PART_BYTES,
+    MultipartUpload,
+    copy_object,
+    delete_object,
+    get_bytes,
+    get_s3_config,
+    presign_get,
+    presign_get_inline,
+    presign_many,
+    put_bytes_async,
+    s3_stats,
+)
 from app.weather.weather_chart import MONTHS, MonthlyWeather, render_weather_chart
 
-app = FastAPI(title="ETI360 Internal API", docs_url="/docs", redoc_url=None)
+# Every route shares one lazily-borrowed pooled connection per request (see `db.request_session`).
+app = FastAPI(title="ETI360 Internal API", docs_url="/docs", redoc_url=None, dependencies=[Depends(db.request_session)])
 _STATIC_DIR = Path(__file__).resolve().parent / "static"
 app.mount("/static", StaticFiles(directory=str(_STATIC_DIR)), name="static")
 
 
+@app.middleware("http")
+async def _db_usage_headers(request: Request, call_next: Any) -> Response:
+    """
+    Report per-request DB round trips so page views can be audited from the browser devtools.
+    """
+    response = await call_next(request)
+    sess = getattr(request.state, "db_session", None)
+    if sess is not None:
+        response.headers["X-DB-Queries"] = str(sess.queries)
+        response.headers["X-DB-Connections"] = str(sess.connections)
+    return response
+
+
 def _load_local_env_files() -> None:
     """
     Best-effort local env loading when uvicorn is launched directly.
@@ -113,13 +149,11 @@ def _startup_reconcile() -> None:
     Best-effort reconciliation so required prompts/usage tables exist without manual UI actions.
     """
     try:
-        with _connect() as conn:
-            with conn.cursor() as cur:
-                _apply_ops_migrations(cur)
-                _ensure_usage_tables(cur)
-                _ensure_prompts_tables(cur)
-                _ensure_documents_tables(cur)
-            conn.commit()
+        report = _verify_schema()
+        failed = {k: v for k, v in report["steps"].items() if v != "ok"}
+        if failed:
+            print(f"[startup] schema steps failed: {failed}")
+        db.listen(_get_database_url(), _AUTH_INVALIDATE_CHANNEL, _on_auth_invalidate)
         _bootstrap_schools_from_static()
         _reconcile_required_prompts(edited_by={"id": "startup", "username": "startup", "role": "admin"}, change_note="Startup reconcile")
         _maybe_start_jobs_worker()
@@ -128,6 +162,20 @@ def _startup_reconcile() -> None:
         print(f"[startup] reconcile skipped: {e}")
 
 
+@app.on_event("shutdown")
+def _shutdown_close_pool() -> None:
+    try:
+        _flush_session_touches()
+    except Exception as e:
+        print(f"[shutdown] last_seen_at flush skipped: {e}")
+    _stop_jobs_background(timeout=5.0)
+    try:
+        _flush_job_logs()
+    except Exception as e:
+        print(f"[shutdown] job log flush skipped: {e}")
+    db.close_pool()
+
+
 def _auth_disabled() -> bool:
     mode = os.environ.get("AUTH_MODE", "").strip().lower()
     if mode in {"0", "false", "no", "off", "disabled"}:
@@ -146,6 +194,22 @@ def _require_api_key(x_api_key: str | None) -> None:
         raise HTTPException(status_code=401, detail="Invalid API key")
 
 
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name, "").strip()
+    try:
+        return int(raw) if raw else default
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.environ.get(name, "").strip()
+    try:
+        return float(raw) if raw else default
+    except Exception:
+        return default
+
+
 def _get_database_url() -> str:
     database_url = os.environ.get("DATABASE_URL", "").strip()
     if not database_url:
@@ -153,8 +217,14 @@ def _get_database_url() -> str:
     return database_url
 
 
-def _connect() -> psycopg.Connection:
-    return psycopg.connect(_get_database_url())
+def _connect() -> AbstractContextManager[psycopg.Connection]:
+    """
+    Borrow a connection from the process-wide pool (see `app.db`).
+
+    Callers keep the `with _connect() as conn:` idiom; the connection goes back to the
+    pool (committed or rolled back) when the block exits instead of being closed.
+    """
+    return db.connection(_get_database_url())
 
 
 def _schema(sql: str) -> str:
@@ -251,6 +321,94 @@ def _list_sql_migrations() -> list[Path]:
     return files
 
 
+_SCHEMA_READY: set[str] = set()
+_SCHEMA_STEPS: dict[str, Any] = {}
+_SCHEMA_LOCK = threading.Lock()
+_SCHEMA_TLS = threading.local()
+_SCHEMA_LAST_ATTEMPT = 0.0
+# Shared by every instance so the bootstrap DDL runs one-at-a-time across the fleet.
+_SCHEMA_ADVISORY_LOCK_KEY = 360_000_001
+_SCHEMA_RETRY_SECONDS = 30.0
+_COLUMN_CACHE: set[tuple[str, str, str]] = set()
+
+
+def _schema_step(name: str):
+    """
+    Register an `_ensure_*` helper with the schema-readiness registry.
+
+    Once `_verify_schema()` has applied the step in this process the helper is a no-op, so
+    request/job hot paths issue no DDL. If the startup bootstrap didn't run (e.g. DB was
+    unreachable), the first call retries it; failing that, the DDL runs inline as before.
+    """
+
+    def deco(fn):
+        _SCHEMA_STEPS[name] = fn
+
+        @functools.wraps(fn)
+        def wrapper(cur: psycopg.Cursor) -> None:
+            if name in _SCHEMA_READY:
+                return
+            if getattr(_SCHEMA_TLS, "active", False):
+                fn(cur)
+                return
+            if time.monotonic() - _SCHEMA_LAST_ATTEMPT >= _SCHEMA_RETRY_SECONDS:
+                try:
+                    _verify_schema()
+                except Exception as e:
+                    print(f"[schema] bootstrap failed: {e}")
+                if name in _SCHEMA_READY:
+                    return
+            fn(cur)
+
+        return wrapper
+
+    return deco
+
+
+def _verify_schema(*, force: bool = False) -> dict[str, Any]:
+    """
+    Apply every registered schema step once, under a Postgres advisory lock.
+
+    Each step runs in its own savepoint so one failing step doesn't block the others;
+    steps are only marked ready after the transaction commits. `force=True` clears the
+    in-memory flags and re-verifies everything (used by `/admin/schema/verify`).
+    """
+    global _SCHEMA_LAST_ATTEMPT
+    with _SCHEMA_LOCK:
+        if force:
+            _SCHEMA_READY.clear()
+            _COLUMN_CACHE.clear()
+        pending = [n for n in _SCHEMA_STEPS if n not in _SCHEMA_READY]
+        steps: dict[str, str] = {n: "ok" for n in _SCHEMA_STEPS if n in _SCHEMA_READY}
+        if not pending:
+            return {"ok": True, "steps": steps, "ready": sorted(_SCHEMA_READY)}
+
+        _SCHEMA_LAST_ATTEMPT = time.monotonic()
+        t0 = time.perf_counter()
+        applied: list[str] = []
+        _SCHEMA_TLS.active = True
+        try:
+            with _connect() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_xact_lock(%s);", (_SCHEMA_ADVISORY_LOCK_KEY,))
+                    for name in pending:
+                        try:
+                            with conn.transaction():
+                                _SCHEMA_STEPS[name](cur)
+                            applied.append(name)
+                            steps[name] = "ok"
+                        except Exception as e:
+                            steps[name] = f"error: {e}"
+                conn.commit()
+        finally:
+            _SCHEMA_TLS.active = False
+        _SCHEMA_READY.update(applied)
+        elapsed_ms = int((time.perf_counter() - t0) * 1000)
+        print(f"[schema] verified {len(applied)}/{len(pending)} steps in {elapsed_ms}ms")
+        return {"ok": len(applied) == len(pending), "steps": steps, "ready": sorted(_SCHEMA_READY), "elapsed_ms": elapsed_ms}
+
+
+@_schema_step("ops_migrations")
 def _apply_ops_migrations(cur: psycopg.Cursor) -> None:
     """
     Lightweight SQL migration runner.
@@ -289,55 +447,273 @@ def _ensure_arp_tables(cur: psycopg.Cursor) -> None:
     _apply_ops_migrations(cur)
 
 
-_JOBS_THREAD: threading.Thread | None = None
+def _store_artifact(
+    cur: psycopg.Cursor,
+    *,
+    region: str,
+    bucket: str,
+    prefix: str,
+    body: bytes,
+    content_type: str,
+    name: str = "",
+    digest: str = "",
+) -> Blob:
+    # Artifact registry tables are created via migrations (0008).
+    _apply_ops_migrations(cur)
+    return store_blob(
+        cur,
+        schema=_jobs_schema_name(),
+        region=region,
+        bucket=bucket,
+        prefix=prefix,
+        body=body,
+        content_type=content_type,
+        name=name,
+        digest=digest,
+    )
+
+
+_JOBS_THREADS: list[threading.Thread] = []
+_JOBS_THREADS_LOCK = threading.Lock()
+
+# Serializes claims across all workers/instances so per-kind running counts are exact.
+_JOBS_CLAIM_LOCK_KEY = 360_000_002
+
+# Enqueue/finish NOTIFY this channel; idle workers block on it instead of polling.
+_JOBS_CHANNEL = "eti360_jobs"
+# Per-job progress (status change, log flush, finish) with the job id as payload; feeds SSE streams.
+_JOB_EVENTS_CHANNEL = "eti360_job_events"
+_JOBS_WAKE = threading.Condition()
+_JOBS_WAKE_SEQ = 0
+_JOBS_LISTENING = False
+# Set by `_stop_jobs_workers` (standalone worker shutdown); idle workers exit, busy ones finish their job first.
+_JOBS_STOP = threading.Event()
+# Set by `_stop_jobs_background` once workers are done: the heartbeat/reaper and job-log flusher
+# threads exit, so nothing borrows a connection (and reopens the pool) after `db.close_pool()`.
+_JOBS_BACKGROUND_STOP = threading.Event()
+
+# Higher runs first. Single-item jobs default to interactive so a one-city request isn't stuck
+# behind someone's bulk batch; see `_job_default_priority`.
+_JOBS_PRIORITY_BULK = 0
+_JOBS_PRIORITY_INTERACTIVE = 10
+
+# Long batches default to one at a time so they can't occupy every worker.
+_JOBS_DEFAULT_KIND_LIMITS = {
+    "weather_auto_batch": 1,
+    "arp_prepare": 1,
+    "arp_prepare_generate": 1,
+    # Fan-out children (see `_job_spawn_children`); bounded by JOBS_WORKERS as well.
+    "weather_auto_one": 4,
+    "arp_prepare_one": 4,
+}
 
 
 def _jobs_worker_mode() -> str:
+    """
+    `thread` runs workers inside the web process; `external` leaves them to `python -m app.worker`
+    (the web process only enqueues); `off` disables them.
+    """
     return (os.environ.get("JOBS_WORKER_MODE", "thread") or "thread").strip().lower()
 
 
+def _jobs_worker_count() -> int:
+    return max(1, min(_env_int("JOBS_WORKERS", 2), 32))
+
+
+def _jobs_kind_limits() -> dict[str, int]:
+    """
+    Max concurrently running jobs per kind (across all instances). `JOBS_KIND_LIMITS` is a
+    comma-separated list like `weather_auto_batch=1,arp_prepare=2`; unlisted kinds are unlimited.
+    """
+    limits = dict(_JOBS_DEFAULT_KIND_LIMITS)
+    for part in (os.environ.get("JOBS_KIND_LIMITS", "") or "").split(","):
+        k, sep, v = part.partition("=")
+        if not sep or not k.strip():
+            continue
+        try:
+            limits[k.strip()] = max(0, int(v.strip()))
+        except ValueError:
+            continue
+    return limits
+
+
 def _maybe_start_jobs_worker() -> None:
-    global _JOBS_THREAD
     mode = _jobs_worker_mode()
-    if mode in {"0", "false", "no", "off", "disabled"}:
-        return
-    if _JOBS_THREAD and _JOBS_THREAD.is_alive():
+    if mode in {"0", "false", "no", "off", "disabled", "external"}:
         return
-
-    t = threading.Thread(target=_jobs_worker_loop, name="eti360-jobs-worker", daemon=True)
-    t.start()
-    _JOBS_THREAD = t
+    _start_jobs_workers(_jobs_worker_count())
+
+
+def _start_jobs_workers(count: int) -> list[threading.Thread]:
+    global _JOBS_LISTENING
+    _JOBS_STOP.clear()
+    _JOBS_BACKGROUND_STOP.clear()
+    with _JOBS_THREADS_LOCK:
+        if not _JOBS_LISTENING:
+            db.listen(_get_database_url(), _JOBS_CHANNEL, _on_jobs_notify)
+            _JOBS_LISTENING = True
+        _JOBS_THREADS[:] = [t for t in _JOBS_THREADS if t.is_alive()]
+        for i in range(len(_JOBS_THREADS), max(1, int(count))):
+            t = threading.Thread(target=_jobs_worker_loop, name=f"eti360-jobs-worker-{i + 1}", daemon=True)
+            t.start()
+            _JOBS_THREADS.append(t)
+        return list(_JOBS_THREADS)
+
+
+def _stop_jobs_workers(*, timeout: float) -> list[str]:
+    """
+    Ask workers to stop claiming and wait up to `timeout` seconds for running jobs to finish.
+    Returns the ids still running; their heartbeats stop with the process and the reaper requeues them.
+    """
+    _JOBS_STOP.set()
+    _on_jobs_notify(None)
+    deadline = time.monotonic() + max(0.0, timeout)
+    with _JOBS_THREADS_LOCK:
+        threads = list(_JOBS_THREADS)
+    for t in threads:
+        t.join(timeout=max(0.0, deadline - time.monotonic()))
+    with _JOBS_RUNNING_LOCK:
+        return sorted(_JOBS_RUNNING)
+
+
+def _stop_jobs_background(*, timeout: float) -> None:
+    """
+    Stop the heartbeat/reaper and job-log flusher threads and wait up to `timeout` seconds for
+    them. Call before `db.close_pool()`; buffered log lines are left for a final `_flush_job_logs()`.
+    """
+    _JOBS_BACKGROUND_STOP.set()
+    _JOB_LOG_WAKE.set()
+    deadline = time.monotonic() + max(0.0, timeout)
+    for t in (_JOBS_HEARTBEAT_THREAD, _JOB_LOG_THREAD):
+        if t is not None and t is not threading.current_thread():
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
 
 
 def _jobs_poll_seconds() -> float:
+    # Safety net only: workers are normally woken by NOTIFY on `_JOBS_CHANNEL`.
     try:
-        return float(os.environ.get("JOBS_POLL_SECONDS", "2").strip() or "2")
+        return float(os.environ.get("JOBS_POLL_SECONDS", "30").strip() or "30")
     except Exception:
-        return 2.0
+        return 30.0
+
+
+def _on_jobs_notify(payload: str | None) -> None:
+    # Any job event (or a listener reconnect, payload=None) may free up claimable work.
+    global _JOBS_WAKE_SEQ
+    with _JOBS_WAKE:
+        _JOBS_WAKE_SEQ += 1
+        _JOBS_WAKE.notify_all()
+
+
+def _jobs_wait_for_wakeup(seen_seq: int) -> None:
+    """
+    Block until a job NOTIFY arrives after `seen_seq` was read, or the fallback poll interval passes.
+    """
+    with _JOBS_WAKE:
+        _JOBS_WAKE.wait_for(lambda: _JOBS_WAKE_SEQ != seen_seq or _JOBS_STOP.is_set(), timeout=max(0.5, _jobs_poll_seconds()))
 
 
 def _jobs_schema_name() -> str:
     return _require_safe_ident("OPS_SCHEMA", OPS_SCHEMA)
 
 
-def _enqueue_job(*, kind: str, payload: dict[str, Any], created_by: str = "") -> str:
+def _jobs_dedupe_reuse_seconds() -> float:
+    return max(0.0, _env_float("JOBS_DEDUPE_REUSE_SECONDS", 300.0))
+
+
+def _job_dedupe_normalize(value: Any) -> Any:
+    # Key order, surrounding whitespace and list order/duplicates don't change what a job does.
+    if isinstance(value, dict):
+        return {str(k): _job_dedupe_normalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple, set)):
+        items = [_job_dedupe_normalize(v) for v in value]
+        if all(isinstance(v, (str, int, float, bool)) or v is None for v in items):
+            return sorted({json.dumps(v) for v in items})
+        return items
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _job_dedupe_key(*, kind: str, payload: dict[str, Any]) -> str:
+    canonical = json.dumps({"kind": kind, "payload": _job_dedupe_normalize(payload)}, sort_keys=True, separators=(",", ":"))
+    return sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _job_default_priority(*, kind: str, payload: dict[str, Any]) -> int:
+    items = payload.get("locations") or payload.get("activity_ids") or []
+    return _JOBS_PRIORITY_INTERACTIVE if len(items) <= 1 else _JOBS_PRIORITY_BULK
+
+
+def _enqueue_job(
+    *, kind: str, payload: dict[str, Any], created_by: str = "", dedupe: bool = True, priority: int | None = None
+) -> str:
+    """
+    Insert a queued job and wake the workers (priority defaults from `_job_default_priority`). With `dedupe`, an identical job (same kind + normalized
+    payload) that is still in flight is returned instead, as is one that finished ok within
+    JOBS_DEDUPE_REUSE_SECONDS (skipped when the payload asks for `force_refresh`).
+    """
     kind = (kind or "").strip()
     if not kind:
         raise HTTPException(status_code=400, detail="Missing job kind")
+    dedupe_key = _job_dedupe_key(kind=kind, payload=payload) if dedupe else None
+    reuse_seconds = 0.0 if payload.get("force_refresh") else _jobs_dedupe_reuse_seconds()
+    if priority is None:
+        priority = _job_default_priority(kind=kind, payload=payload)
     with _connect() as conn:
         with conn.cursor() as cur:
             _apply_ops_migrations(cur)
             schema = _jobs_schema_name()
-            cur.execute(
-                f'INSERT INTO "{schema}".jobs(kind, payload, created_by) VALUES (%s, %s::jsonb, %s) RETURNING id;',
-                (kind, json.dumps(payload), created_by),
-            )
-            (job_id,) = cur.fetchone()
+            if dedupe_key and reuse_seconds > 0:
+                cur.execute(
+                    f"""
+                    SELECT id FROM "{schema}".jobs
+                    WHERE dedupe_key=%s AND status='ok' AND finished_at > now() - make_interval(secs => %s)
+                    ORDER BY finished_at DESC
+                    LIMIT 1;
+                    """,
+                    (dedupe_key, reuse_seconds),
+                )
+                row = cur.fetchone()
+                if row:
+                    return str(row[0])
+            # The in-flight unique index makes concurrent enqueues single-flight; a loser picks up the
+            # winner's id (retrying if that job finished in between).
+            for _ in range(3):
+                cur.execute(
+                    f"""
+                    INSERT INTO "{schema}".jobs(kind, payload, created_by, dedupe_key, priority)
+                    VALUES (%s, %s::jsonb, %s, %s, %s)
+                    ON CONFLICT (dedupe_key) WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running', 'waiting')
+                    DO NOTHING
+                    RETURNING id;
+                    """,
+                    (kind, json.dumps(payload), created_by, dedupe_key, int(priority)),
+                )
+                row = cur.fetchone()
+                if row:
+                    (job_id,) = row
+                    db.notify(cur, _JOBS_CHANNEL, f"queued:{job_id}")
+                    break
+                cur.execute(
+                    f"SELECT id FROM \"{schema}\".jobs WHERE dedupe_key=%s AND status IN ('queued', 'running', 'waiting') LIMIT 1;",
+                    (dedupe_key,),
+                )
+                row = cur.fetchone()
+                if row:
+                    conn.commit()
+                    return str(row[0])
+            else:
+                raise HTTPException(status_code=409, detail="Could not enqueue job; try again")
         conn.commit()
     return str(job_id)
 
 
-def _get_job(job_id: str) -> dict[str, Any] | None:
+def _get_job(job_id: str, *, include_log: bool = True) -> dict[str, Any] | None:
+    """
+    Full job row. `log` joins the legacy `jobs.log` text with `job_log_lines`; with
+    include_log=False only the legacy text is returned (tail `/jobs/api/{job_id}/log` for the rest).
+    """
     job_id = (job_id or "").strip()
     if not job_id:
         return None
@@ -345,14 +721,21 @@ def _get_job(job_id: str) -> dict[str, Any] | None:
         with conn.cursor() as cur:
             _apply_ops_migrations(cur)
             schema = _jobs_schema_name()
+            log_sql = "j.log"
+            if include_log:
+                log_sql = (
+                    "j.log || COALESCE((SELECT string_agg(l.line || E'\\n', '' ORDER BY l.seq) "
+                    f'FROM "{schema}".job_log_lines l WHERE l.job_id=j.id), \'\')'
+                )
             cur.execute(
-                f'SELECT id, kind, status, payload, result, error, log, created_by, created_at, started_at, finished_at, heartbeat_at '
-                f'FROM "{schema}".jobs WHERE id=%s;',
+                f"SELECT j.id, j.kind, j.status, j.payload, j.result, j.error, {log_sql}, j.created_by, "
+                f"j.created_at, j.started_at, j.finished_at, j.heartbeat_at "
+                f'FROM "{schema}".jobs j WHERE j.id=%s;',
                 (job_id,),
             )
             row = cur.fetchone()
             if not row:
-                return None
+                return _get_archived_job(cur, job_id=job_id)
             (
                 jid,
                 kind,
@@ -383,6 +766,76 @@ def _get_job(job_id: str) -> dict[str, Any] | None:
             }
 
 
+def _get_job_log(job_id: str, *, after_seq: int = 0, limit: int = 1000) -> dict[str, Any] | None:
+    """
+    Log lines with seq > after_seq (oldest first) plus the job status, for incremental tailing.
+    """
+    job_id = (job_id or "").strip()
+    if not job_id:
+        return None
+    limit = max(1, min(int(limit or 1000), 5000))
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _apply_ops_migrations(cur)
+            schema = _jobs_schema_name()
+            cur.execute(f'SELECT status FROM "{schema}".jobs WHERE id=%s;', (job_id,))
+            row = cur.fetchone()
+            if not row:
+                # Archived jobs keep no log lines.
+                cur.execute(f'SELECT status FROM "{schema}".jobs_archive WHERE id=%s;', (job_id,))
+                row = cur.fetchone()
+                if not row:
+                    return None
+                return {"status": row[0], "lines": [], "last_seq": int(after_seq or 0), "more": False}
+            (status,) = row
+            cur.execute(
+                f"""
+                SELECT seq, ts, line
+                FROM "{schema}".job_log_lines
+                WHERE job_id=%s AND seq > %s
+                ORDER BY seq ASC
+                LIMIT %s;
+                """,
+                (job_id, int(after_seq or 0), limit),
+            )
+            lines = [
+                {"seq": int(seq), "ts": ts.isoformat() if ts else None, "line": str(line or "")}
+                for seq, ts, line in (cur.fetchall() or [])
+            ]
+    last_seq = lines[-1]["seq"] if lines else int(after_seq or 0)
+    return {"status": status, "lines": lines, "last_seq": last_seq, "more": len(lines) >= limit}
+
+
+def _get_archived_job(cur: psycopg.Cursor, *, job_id: str) -> dict[str, Any] | None:
+    cur.execute(
+        f"""
+        SELECT id, kind, status, payload_summary, result_summary, error, created_by, created_at, started_at, finished_at
+        FROM "{_jobs_schema_name()}".jobs_archive
+        WHERE id=%s;
+        """,
+        (job_id,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    jid, kind, status, payload, result, err, created_by, created_at, started_at, finished_at = row
+    return {
+        "id": str(jid),
+        "kind": kind,
+        "status": status,
+        "payload": payload,
+        "result": result,
+        "error": err,
+        "log": "",
+        "created_by": created_by,
+        "created_at": created_at.isoformat() if created_at else None,
+        "started_at": started_at.isoformat() if started_at else None,
+        "finished_at": finished_at.isoformat() if finished_at else None,
+        "heartbeat_at": None,
+        "archived": True,
+    }
+
+
 def _list_jobs(*, limit: int = 100) -> list[dict[str, Any]]:
     limit = max(1, min(int(limit or 100), 500))
     with _connect() as conn:
@@ -390,7 +843,8 @@ def _list_jobs(*, limit: int = 100) -> list[dict[str, Any]]:
             _apply_ops_migrations(cur)
             schema = _jobs_schema_name()
             cur.execute(
-                f'SELECT id, kind, status, created_at, started_at, finished_at FROM "{schema}".jobs ORDER BY created_at DESC LIMIT %s;',
+                f"SELECT id, kind, status, created_at, started_at, finished_at FROM \"{schema}\".jobs "
+                "WHERE parent_id IS NULL ORDER BY created_at DESC LIMIT %s;",
                 (limit,),
             )
             out: list[dict[str, Any]] = []
@@ -408,72 +862,604 @@ def _list_jobs(*, limit: int = 100) -> list[dict[str, Any]]:
             return out
 
 
-def _jobs_worker_loop() -> None:
+def _jobs_retention_days() -> int:
+    # 0 keeps finished jobs in the hot table forever.
+    return max(0, _env_int("JOBS_RETENTION_DAYS", 30))
+
+
+_JOBS_ARCHIVE_INTERVAL_SECONDS = 3600.0
+# One batch per heartbeat tick: a large backlog (e.g. the first run after deploy) drains over
+# several ticks instead of delaying heartbeats past JOBS_STALE_SECONDS.
+_JOBS_ARCHIVE_BATCH_SIZE = 200
+_JOBS_LAST_ARCHIVE = 0.0
+
+
+def _job_summary(value: Any) -> dict[str, Any]:
+    """
+    Compact, bounded view of a job payload/result for the archive: scalars are kept (long strings
+    clipped), lists become counts (`errors` keeps its first 20 entries), nested objects are dropped.
+    """
+    if not isinstance(value, dict):
+        return {}
+    out: dict[str, Any] = {}
+    for k, v in value.items():
+        if isinstance(v, str):
+            out[k] = v[:500]
+        elif v is None or isinstance(v, (bool, int, float)):
+            out[k] = v
+        elif isinstance(v, list):
+            out[f"{k}_count"] = len(v)
+            if k == "errors":
+                out[k] = [str(x)[:500] for x in v[:20]]
+    return out
+
+
+def _archive_old_jobs(*, days: int | None = None, batch_size: int = 200, max_batches: int = 0) -> dict[str, int]:
+    """
+    Move finished top-level jobs older than `days` into `jobs_archive` (summaries only) and delete
+    them from the hot table; log lines, checkpoints and fan-out children cascade.
+
+    Stops after `max_batches` batches (0 = until nothing is left); `more` is 1 when it stopped early.
+    """
+    days = _jobs_retention_days() if days is None else max(0, int(days))
+    if days <= 0:
+        return {"archived": 0, "more": 0}
+    schema = _jobs_schema_name()
+    archived = 0
+    batches = 0
+    more = 0
     while True:
+        with _connect() as conn:
+            with conn.cursor() as cur:
+                _apply_ops_migrations(cur)
+                cur.execute(
+                    f"""
+                    SELECT j.id, j.kind, j.status, j.created_by, j.payload, j.result, j.error, j.attempts,
+                           (SELECT COUNT(*) FROM "{schema}".jobs c WHERE c.parent_id=j.id),
+                           j.created_at, j.started_at, j.finished_at
+                    FROM "{schema}".jobs j
+                    WHERE j.parent_id IS NULL
+                      AND j.status IN ('ok', 'error', 'cancelled')
+                      AND j.finished_at < now() - make_interval(days => %s)
+                    ORDER BY j.finished_at ASC
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED;
+                    """,
+                    (days, batch_size),
+                )
+                rows = cur.fetchall() or []
+                if not rows:
+                    conn.commit()
+                    break
+                cur.executemany(
+                    f"""
+                    INSERT INTO "{schema}".jobs_archive
+                      (id, kind, status, created_by, payload_summary, result_summary, error, attempts, children,
+                       created_at, started_at, finished_at)
+                    VALUES (%s, %s, %s, %s, %s::jsonb, %s::jsonb, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (id) DO NOTHING;
+                    """,
+                    [
+                        (
+                            jid,
+                            kind,
+                            status,
+                            created_by or "",
+                            json.dumps(_job_summary(payload)),
+                            json.dumps(_job_summary(result)),
+                            (err or "")[:2000],
+                            int(attempts or 0),
+                            int(children or 0),
+                            created_at,
+                            started_at,
+                            finished_at,
+                        )
+                        for jid, kind, status, created_by, payload, result, err, attempts, children, created_at, started_at, finished_at in rows
+                    ],
+                )
+                cur.execute(f'DELETE FROM "{schema}".jobs WHERE id = ANY(%s::uuid[]);', ([r[0] for r in rows],))
+            conn.commit()
+        archived += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+        if max_batches and batches >= max_batches:
+            more = 1
+            break
+    if archived:
+        print(f"[jobs] archived {archived} jobs older than {days} days{' (more pending)' if more else ''}")
+    return {"archived": archived, "more": more}
+
+
+def _maybe_archive_old_jobs() -> None:
+    global _JOBS_LAST_ARCHIVE
+    now = time.monotonic()
+    with _JOBS_RUNNING_LOCK:
+        if now - _JOBS_LAST_ARCHIVE < _JOBS_ARCHIVE_INTERVAL_SECONDS:
+            return
+        _JOBS_LAST_ARCHIVE = now
+    if _archive_old_jobs(batch_size=_JOBS_ARCHIVE_BATCH_SIZE, max_batches=1)["more"]:
+        # Backlog left: take the next batch on the next tick rather than in an hour.
+        with _JOBS_RUNNING_LOCK:
+            _JOBS_LAST_ARCHIVE = 0.0
+
+
+def _jobs_stale_seconds() -> int:
+    return max(60, _env_int("JOBS_STALE_SECONDS", 300))
+
+
+def _jobs_heartbeat_seconds() -> float:
+    # Well under the stale threshold so a slow LLM call never looks abandoned.
+    return max(5.0, min(_env_float("JOBS_HEARTBEAT_SECONDS", 30.0), _jobs_stale_seconds() / 3))
+
+
+def _jobs_max_attempts() -> int:
+    return max(1, _env_int("JOBS_MAX_ATTEMPTS", 3))
+
+
+_JOBS_RUNNING: set[str] = set()
+_JOBS_RUNNING_LOCK = threading.Lock()
+_JOBS_HEARTBEAT_THREAD: threading.Thread | None = None
+_JOBS_LAST_REAP = 0.0
+
+
+def _jobs_heartbeat_loop() -> None:
+    """
+    Bump heartbeat_at for every job this process is running, independent of log output.
+    """
+    while not _JOBS_BACKGROUND_STOP.wait(_jobs_heartbeat_seconds()):
+        with _JOBS_RUNNING_LOCK:
+            ids = sorted(_JOBS_RUNNING)
+        try:
+            if ids:
+                with _connect() as conn:
+                    with conn.cursor() as cur:
+                        cur.execute(
+                            f'UPDATE "{_jobs_schema_name()}".jobs SET heartbeat_at=now() WHERE id = ANY(%s::uuid[]) AND status=\'running\';',
+                            (ids,),
+                        )
+                    conn.commit()
+        except Exception as e:
+            print(f"[jobs] heartbeat failed: {e}")
+        # Housekeeping is bounded per tick and can't skip the next heartbeat if it fails.
+        try:
+            _maybe_reap_stale_jobs()
+            _maybe_archive_old_jobs()
+        except Exception as e:
+            print(f"[jobs] housekeeping failed: {e}")
+
+
+def _reap_stale_jobs() -> dict[str, int]:
+    """
+    Requeue `running` jobs whose heartbeat is older than JOBS_STALE_SECONDS (their worker died,
+    e.g. an instance restart). Jobs that already used JOBS_MAX_ATTEMPTS are failed instead.
+    Handlers resume from `job_checkpoints`.
+
+    Also requeues fan-out parents left `waiting` although every child has finished (e.g. the last
+    child's wakeup was lost), so they aggregate instead of blocking dedupe forever.
+    """
+    schema = _jobs_schema_name()
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _apply_ops_migrations(cur)
+            cur.execute(
+                f"""
+                UPDATE "{schema}".jobs
+                SET status = CASE WHEN attempts >= %s THEN 'error' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= %s THEN 'Abandoned: worker stopped heartbeating' ELSE error END,
+                    finished_at = CASE WHEN attempts >= %s THEN now() ELSE finished_at END
+                WHERE status='running'
+                  AND COALESCE(heartbeat_at, started_at, created_at) < now() - make_interval(secs => %s)
+                RETURNING id, status;
+                """,
+                (_jobs_max_attempts(), _jobs_max_attempts(), _jobs_max_attempts(), _jobs_stale_seconds()),
+            )
+            rows = cur.fetchall() or []
+            for jid, status in rows:
+                db.notify(cur, _JOBS_CHANNEL, f"{'requeued' if status == 'queued' else 'finished'}:{jid}")
+                db.notify(cur, _JOB_EVENTS_CHANNEL, str(jid))
+                if status == "error":
+                    _job_wake_parent(cur, job_id=str(jid))
+
+            cur.execute(
+                f"""
+                UPDATE "{schema}".jobs p
+                SET status='queued', heartbeat_at=now()
+                WHERE p.status='waiting'
+                  AND NOT EXISTS (
+                    SELECT 1 FROM "{schema}".jobs c
+                    WHERE c.parent_id=p.id AND c.status NOT IN ('ok', 'error', 'cancelled')
+                  )
+                RETURNING p.id;
+                """
+            )
+            woken = [r[0] for r in (cur.fetchall() or [])]
+            for jid in woken:
+                db.notify(cur, _JOBS_CHANNEL, f"queued:{jid}")
+                db.notify(cur, _JOB_EVENTS_CHANNEL, str(jid))
+        conn.commit()
+    requeued = sum(1 for _, st in rows if st == "queued")
+    if rows or woken:
+        print(f"[jobs] reaper: requeued={requeued} failed={len(rows) - requeued} parents_woken={len(woken)}")
+    return {"requeued": requeued, "failed": len(rows) - requeued, "parents_woken": len(woken)}
+
+
+def _maybe_reap_stale_jobs() -> None:
+    global _JOBS_LAST_REAP
+    now = time.monotonic()
+    with _JOBS_RUNNING_LOCK:
+        if now - _JOBS_LAST_REAP < _jobs_stale_seconds() / 2:
+            return
+        _JOBS_LAST_REAP = now
+    _reap_stale_jobs()
+
+
+def _jobs_worker_loop() -> None:
+    global _JOBS_HEARTBEAT_THREAD
+    with _JOBS_RUNNING_LOCK:
+        if not (_JOBS_HEARTBEAT_THREAD and _JOBS_HEARTBEAT_THREAD.is_alive()):
+            _JOBS_HEARTBEAT_THREAD = threading.Thread(target=_jobs_heartbeat_loop, name="eti360-jobs-heartbeat", daemon=True)
+            _JOBS_HEARTBEAT_THREAD.start()
+    while not _JOBS_STOP.is_set():
         try:
+            # Read the wakeup counter before claiming so a NOTIFY racing the claim isn't lost.
+            seen_seq = _JOBS_WAKE_SEQ
             job = _claim_next_job()
             if not job:
-                time.sleep(_jobs_poll_seconds())
+                _jobs_wait_for_wakeup(seen_seq)
                 continue
-            _run_job(job_id=job["id"], kind=job["kind"], payload=job["payload"])
+            with _JOBS_RUNNING_LOCK:
+                _JOBS_RUNNING.add(job["id"])
+            try:
+                _run_job(job_id=job["id"], kind=job["kind"], payload=job["payload"])
+            finally:
+                with _JOBS_RUNNING_LOCK:
+                    _JOBS_RUNNING.discard(job["id"])
         except Exception as e:
             print(f"[jobs] worker loop error: {e}")
             time.sleep(2.0)
 
 
+def _job_checkpoints(job_id: str | None, *, step: str) -> dict[str, Any]:
+    """
+    Results recorded by `_job_checkpoint` for this job/step, keyed by item (empty for a fresh job).
+    """
+    if not job_id:
+        return {}
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f'SELECT item, result FROM "{_jobs_schema_name()}".job_checkpoints WHERE job_id=%s AND step=%s;',
+                (job_id, step),
+            )
+            return {str(item): result for item, result in (cur.fetchall() or [])}
+
+
+def _job_checkpoint(job_id: str | None, *, step: str, item: str, result: Any) -> None:
+    if not job_id:
+        return
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                INSERT INTO "{_jobs_schema_name()}".job_checkpoints (job_id, step, item, result)
+                VALUES (%s, %s, %s, %s::jsonb)
+                ON CONFLICT (job_id, step, item) DO UPDATE SET result=EXCLUDED.result, created_at=now();
+                """,
+                (job_id, step, str(item), json.dumps(result, default=str)),
+            )
+        conn.commit()
+
+
 def _claim_next_job() -> dict[str, Any] | None:
+    """
+    Claim the next queued job whose kind is below its running limit (see `_jobs_kind_limits`).
+
+    Highest priority wins; within a priority, users take turns (the user with the fewest running
+    jobs goes first, then whoever has waited longest), and each user's own jobs run oldest first.
+    """
+    limits = _jobs_kind_limits()
     with _connect() as conn:
         with conn.cursor() as cur:
             _apply_ops_migrations(cur)
             schema = _jobs_schema_name()
+            # Claims are short; serializing them keeps the per-kind counts exact across instances.
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (_JOBS_CLAIM_LOCK_KEY,))
             cur.execute(
                 f"""
-                WITH picked AS (
-                  SELECT id
+                WITH running AS (
+                  SELECT kind, COUNT(*) AS n
+                  FROM "{schema}".jobs
+                  WHERE status='running'
+                  GROUP BY kind
+                ),
+                running_users AS (
+                  SELECT created_by, COUNT(*) AS n
                   FROM "{schema}".jobs
-                  WHERE status='queued'
-                  ORDER BY created_at ASC
+                  WHERE status='running'
+                  GROUP BY created_by
+                ),
+                limits AS (
+                  SELECT kind, lim FROM unnest(%s::text[], %s::int[]) AS t(kind, lim)
+                ),
+                heads AS (
+                  -- Each user's next runnable job (walks jobs_queued_claim_idx).
+                  SELECT DISTINCT ON (q.created_by) q.id, q.created_by, q.priority, q.created_at
+                  FROM "{schema}".jobs q
+                  LEFT JOIN running r ON r.kind = q.kind
+                  LEFT JOIN limits l ON l.kind = q.kind
+                  WHERE q.status='queued'
+                    AND (l.lim IS NULL OR COALESCE(r.n, 0) < l.lim)
+                  ORDER BY q.created_by, q.priority DESC, q.created_at ASC
+                ),
+                picked AS (
+                  SELECT j.id
+                  FROM heads h
+                  JOIN "{schema}".jobs j ON j.id = h.id
+                  LEFT JOIN running_users u ON u.created_by = h.created_by
+                  ORDER BY h.priority DESC, COALESCE(u.n, 0) ASC, h.created_at ASC
                   LIMIT 1
-                  FOR UPDATE SKIP LOCKED
+                  FOR UPDATE OF j SKIP LOCKED
                 )
                 UPDATE "{schema}".jobs j
-                SET status='running', started_at=COALESCE(started_at, now()), heartbeat_at=now()
+                SET status='running', started_at=COALESCE(started_at, now()), heartbeat_at=now(), attempts=j.attempts + 1
                 FROM picked
                 WHERE j.id=picked.id
                 RETURNING j.id, j.kind, j.payload;
-                """.strip()
+                """.strip(),
+                (list(limits.keys()), list(limits.values())),
             )
             row = cur.fetchone()
             if not row:
                 conn.commit()
                 return None
             jid, kind, payload = row
+            db.notify(cur, _JOB_EVENTS_CHANNEL, str(jid))
             conn.commit()
             return {"id": str(jid), "kind": kind, "payload": payload or {}}
 
 
+# Job log lines are buffered in-process and appended to `job_log_lines` by a flusher thread
+# every JOB_LOG_FLUSH_LINES lines or JOB_LOG_FLUSH_MS, whichever comes first. Buffered lines only
+# carry a local order; their `seq` is allocated from `jobs.log_seq` when they are inserted.
+_JOB_LOG_LOCK = threading.Lock()
+_JOB_LOG_PENDING: dict[str, list[tuple[int, datetime, str]]] = {}
+_JOB_LOG_FIRST_AT: dict[str, float] = {}
+_JOB_LOG_ORDER = 0
+_JOB_LOG_WAKE = threading.Event()
+_JOB_LOG_THREAD: threading.Thread | None = None
+# A job whose lines keep failing to insert is dropped after this many flushes, so it can't
+# stall the flusher; buffered lines per job are capped (oldest dropped) while the DB is down.
+_JOB_LOG_FAILURES: dict[str, int] = {}
+_JOB_LOG_MAX_FAILURES = 5
+_JOB_LOG_MAX_PENDING = 10_000
+
+
+def _job_log_flush_lines() -> int:
+    return max(1, _env_int("JOB_LOG_FLUSH_LINES", 50))
+
+
+def _job_log_flush_ms() -> int:
+    return max(50, _env_int("JOB_LOG_FLUSH_MS", 500))
+
+
 def _job_append_log(cur: psycopg.Cursor, *, job_id: str, line: str) -> None:
+    """
+    Buffer one log line for `job_id`; the flusher writes it (and numbers it) later. `cur` is not
+    used: callers log from inside their own transaction without an extra round trip.
+    """
+    global _JOB_LOG_THREAD, _JOB_LOG_ORDER
+    job_id = str(job_id)
+    with _JOB_LOG_LOCK:
+        _JOB_LOG_ORDER += 1
+        rows = _JOB_LOG_PENDING.setdefault(job_id, [])
+        if not rows:
+            _JOB_LOG_FIRST_AT[job_id] = time.monotonic()
+        rows.append((_JOB_LOG_ORDER, datetime.now(timezone.utc), line.rstrip()))
+        full = len(rows) >= _job_log_flush_lines()
+        if not (_JOB_LOG_THREAD and _JOB_LOG_THREAD.is_alive()):
+            t = threading.Thread(target=_job_log_flush_loop, name="eti360-job-log", daemon=True)
+            t.start()
+            _JOB_LOG_THREAD = t
+    if full:
+        _JOB_LOG_WAKE.set()
+
+
+def _job_log_take(*, job_id: str = "", due_only: bool = False) -> list[tuple[str, int, datetime, str]]:
+    max_age = _job_log_flush_ms() / 1000.0
+    max_lines = _job_log_flush_lines()
+    now = time.monotonic()
+    out: list[tuple[str, int, datetime, str]] = []
+    with _JOB_LOG_LOCK:
+        for jid in [job_id] if job_id else list(_JOB_LOG_PENDING):
+            rows = _JOB_LOG_PENDING.get(jid) or []
+            if not rows:
+                continue
+            if due_only and len(rows) < max_lines and now - _JOB_LOG_FIRST_AT.get(jid, now) < max_age:
+                continue
+            out.extend((jid, seq, ts, line) for seq, ts, line in rows)
+            _JOB_LOG_PENDING.pop(jid, None)
+            _JOB_LOG_FIRST_AT.pop(jid, None)
+    return out
+
+
+def _job_log_write(cur: psycopg.Cursor, rows: list[tuple[str, int, datetime, str]]) -> set[str]:
+    """
+    Insert buffered lines, allocating their `seq` from `jobs.log_seq` in the same statement (the
+    job row lock serializes writers in every process) and bumping the jobs' heartbeats.
+    Returns the job ids whose row no longer exists; their lines are not written.
+    """
+    if not rows:
+        return set()
+    rows = sorted(rows, key=lambda r: (r[0], r[1]))
     schema = _jobs_schema_name()
     cur.execute(
-        f'UPDATE "{schema}".jobs SET log = log || %s, heartbeat_at=now() WHERE id=%s;',
-        ((line.rstrip() + "\n"), job_id),
+        f"""
+        WITH r AS (
+          SELECT * FROM unnest(%s::uuid[], %s::timestamptz[], %s::text[]) WITH ORDINALITY AS r(job_id, ts, line, ord)
+        ), n AS (
+          SELECT job_id, COUNT(*) AS n FROM r GROUP BY job_id
+        ), bump AS (
+          UPDATE "{schema}".jobs j
+          SET log_seq = j.log_seq + n.n, heartbeat_at = now()
+          FROM n
+          WHERE j.id = n.job_id
+          RETURNING j.id, j.log_seq - n.n AS base
+        ), ins AS (
+          INSERT INTO "{schema}".job_log_lines (job_id, seq, ts, line)
+          SELECT r.job_id, b.base + row_number() OVER (PARTITION BY r.job_id ORDER BY r.ord), r.ts, r.line
+          FROM r JOIN bump b ON b.id = r.job_id
+        )
+        SELECT id FROM bump;
+        """,
+        ([r[0] for r in rows], [r[2] for r in rows], [r[3] for r in rows]),
     )
+    found = {str(r[0]) for r in (cur.fetchall() or [])}
+    for jid in sorted(found):
+        db.notify(cur, _JOB_EVENTS_CHANNEL, jid)
+    return {r[0] for r in rows} - found
+
+
+def _job_log_requeue(rows: list[tuple[str, int, datetime, str]]) -> None:
+    with _JOB_LOG_LOCK:
+        for jid, seq, ts, line in rows:
+            pending = _JOB_LOG_PENDING.setdefault(jid, [])
+            if not pending:
+                _JOB_LOG_FIRST_AT[jid] = time.monotonic()
+            pending.append((seq, ts, line))
+        for pending in _JOB_LOG_PENDING.values():
+            pending.sort()
+            if len(pending) > _JOB_LOG_MAX_PENDING:
+                del pending[: len(pending) - _JOB_LOG_MAX_PENDING]
+
+
+def _job_log_drop(job_id: str, *, count: int, reason: str) -> None:
+    with _JOB_LOG_LOCK:
+        _JOB_LOG_FAILURES.pop(job_id, None)
+    print(f"[jobs] dropped {count} log lines for job {job_id}: {reason}")
+
+
+def _flush_job_logs(*, due_only: bool = False) -> int:
+    """
+    Write buffered log lines, one savepoint per job so a bad job can't block the others.
+    Lines for a deleted/archived job are dropped; other per-job failures are retried (with
+    freshly allocated seqs) up to _JOB_LOG_MAX_FAILURES flushes.
+    """
+    rows = _job_log_take(due_only=due_only)
+    if not rows:
+        return 0
+    by_job: dict[str, list[tuple[str, int, datetime, str]]] = {}
+    for r in rows:
+        by_job.setdefault(r[0], []).append(r)
+    handled: set[str] = set()
+    written = 0
+    try:
+        with _connect() as conn:
+            with conn.cursor() as cur:
+                # Sorted so concurrent flushers lock job rows in the same order.
+                for jid, job_rows in sorted(by_job.items()):
+                    try:
+                        with conn.transaction():
+                            missing = _job_log_write(cur, job_rows)
+                        if missing:
+                            handled.add(jid)
+                            _job_log_drop(jid, count=len(job_rows), reason="job row missing (archived or deleted)")
+                            continue
+                    except psycopg.Error as e:
+                        handled.add(jid)
+                        with _JOB_LOG_LOCK:
+                            failures = _JOB_LOG_FAILURES.get(jid, 0) + 1
+                            _JOB_LOG_FAILURES[jid] = failures
+                        if failures >= _JOB_LOG_MAX_FAILURES:
+                            _job_log_drop(jid, count=len(job_rows), reason=f"{failures} failed flushes: {e}")
+                        else:
+                            _job_log_requeue(job_rows)
+                    else:
+                        written += len(job_rows)
+            conn.commit()
+    except Exception:
+        # Connection/commit failure: nothing was written; keep every job not already dealt with.
+        _job_log_requeue([r for jid, job_rows in by_job.items() if jid not in handled for r in job_rows])
+        raise
+    with _JOB_LOG_LOCK:
+        for jid in by_job:
+            if jid not in handled:
+                _JOB_LOG_FAILURES.pop(jid, None)
+    return written
+
+
+def _job_log_flush_loop() -> None:
+    while not _JOBS_BACKGROUND_STOP.is_set():
+        _JOB_LOG_WAKE.wait(timeout=_job_log_flush_ms() / 1000.0)
+        _JOB_LOG_WAKE.clear()
+        if _JOBS_BACKGROUND_STOP.is_set():
+            return
+        try:
+            _flush_job_logs(due_only=True)
+        except Exception as e:
+            print(f"[jobs] log flush failed: {e}")
+            _JOBS_BACKGROUND_STOP.wait(1.0)
+
+
+def _job_log_close(cur: psycopg.Cursor, *, job_id: str) -> None:
+    """
+    Write any buffered lines for a finishing job on the caller's transaction.
+    """
+    _job_log_write(cur, _job_log_take(job_id=str(job_id)))
+
+
+def _job_wake_parent(cur: psycopg.Cursor, *, job_id: str) -> None:
+    """
+    If `job_id` is a child and its siblings are all finished, requeue the waiting parent to aggregate.
+    Locking the parent row serializes concurrent last-child finishes.
+    """
+    schema = _jobs_schema_name()
+    cur.execute(f'SELECT parent_id FROM "{schema}".jobs WHERE id=%s;', (job_id,))
+    row = cur.fetchone()
+    if not row or not row[0]:
+        return
+    parent_id = row[0]
+    cur.execute(f'SELECT status FROM "{schema}".jobs WHERE id=%s FOR UPDATE;', (parent_id,))
+    prow = cur.fetchone()
+    if not prow or prow[0] != "waiting":
+        return
+    cur.execute(
+        f"SELECT COUNT(*) FROM \"{schema}\".jobs WHERE parent_id=%s AND status NOT IN ('ok', 'error', 'cancelled');",
+        (parent_id,),
+    )
+    (pending,) = cur.fetchone()  # type: ignore[misc]
+    if int(pending or 0) > 0:
+        return
+    cur.execute(f"UPDATE \"{schema}\".jobs SET status='queued', heartbeat_at=now() WHERE id=%s;", (parent_id,))
+    db.notify(cur, _JOBS_CHANNEL, f"queued:{parent_id}")
+    db.notify(cur, _JOB_EVENTS_CHANNEL, str(parent_id))
 
 
 def _job_finish_ok(cur: psycopg.Cursor, *, job_id: str, result: dict[str, Any]) -> None:
     schema = _jobs_schema_name()
+    _job_log_close(cur, job_id=job_id)
     cur.execute(
         f'UPDATE "{schema}".jobs SET status=%s, result=%s::jsonb, finished_at=now(), heartbeat_at=now() WHERE id=%s;',
         ("ok", json.dumps(result), job_id),
     )
+    _job_wake_parent(cur, job_id=job_id)
+    # Frees a per-kind slot: wake idle workers (delivered on commit).
+    db.notify(cur, _JOBS_CHANNEL, f"finished:{job_id}")
+    db.notify(cur, _JOB_EVENTS_CHANNEL, str(job_id))
 
 
 def _job_finish_error(cur: psycopg.Cursor, *, job_id: str, error: str, log: str = "") -> None:
     schema = _jobs_schema_name()
+    for line in (log or "").splitlines():
+        _job_append_log(cur, job_id=job_id, line=line)
+    _job_log_close(cur, job_id=job_id)
     cur.execute(
-        f'UPDATE "{schema}".jobs SET status=%s, error=%s, log = log || %s, finished_at=now(), heartbeat_at=now() WHERE id=%s;',
-        ("error", (error or "")[:20000], (log or ""), job_id),
+        f'UPDATE "{schema}".jobs SET status=%s, error=%s, finished_at=now(), heartbeat_at=now() WHERE id=%s;',
+        ("error", (error or "")[:20000], job_id),
     )
+    _job_wake_parent(cur, job_id=job_id)
+    db.notify(cur, _JOBS_CHANNEL, f"finished:{job_id}")
+    db.notify(cur, _JOB_EVENTS_CHANNEL, str(job_id))
 
 
 def _arp_s3_key(*, prefix: str, source_id: str, content_type: str) -> tuple[str, str]:
@@ -492,88 +1478,185 @@ def _arp_s3_key(*, prefix: str, source_id: str, content_type: str) -> tuple[str,
     return key, mime
 
 
-def _arp_fetch_and_store_source(
-    cur: psycopg.Cursor,
-    *,
-    source_id: str,
-    url: str,
-    job_id: str,
-    s3_prefix: str,
-) -> tuple[str, str, str, int]:
+_ARP_UPLOAD_EXECUTOR: ThreadPoolExecutor | None = None
+_ARP_UPLOAD_EXECUTOR_LOCK = threading.Lock()
+
+
+def _arp_upload_concurrency() -> int:
+    return max(1, _env_int("ARP_UPLOAD_CONCURRENCY", 4))
+
+
+def _arp_upload_executor() -> ThreadPoolExecutor:
     """
-    Returns (content_type, s3_bucket, s3_key, bytes_size)
+    Background S3 uploads of freshly fetched ARP sources (parsing doesn't wait for them).
     """
-    cur.execute(
-        _arp_schema('SELECT status, s3_bucket, s3_key, content_type FROM "__ARP_SCHEMA__".documents WHERE source_id=%s;'),
-        (source_id,),
-    )
-    row = cur.fetchone()
-    if row and str(row[0] or "") == "fetched" and str(row[1] or "") and str(row[2] or ""):
-        return str(row[3] or ""), str(row[1] or ""), str(row[2] or ""), 0
+    global _ARP_UPLOAD_EXECUTOR
+    with _ARP_UPLOAD_EXECUTOR_LOCK:
+        if _ARP_UPLOAD_EXECUTOR is None:
+            _ARP_UPLOAD_EXECUTOR = ThreadPoolExecutor(
+                max_workers=_arp_upload_concurrency(), thread_name_prefix="eti360-arp-upload"
+            )
+        return _ARP_UPLOAD_EXECUTOR
 
-    _job_append_log(cur, job_id=job_id, line=f"Fetch: {source_id}")
 
-    u = (url or "").strip()
-    parsed = urlparse(u) if u else None
-    if not parsed or parsed.scheme not in {"http", "https"} or not parsed.netloc:
-        msg = f"Invalid source URL (must start with http:// or https://): {u or '(empty)'}"
+def _arp_record_fetch_status(cur: psycopg.Cursor, *, fetch: FetchResult) -> tuple[str, str, str]:
+    """
+    Record a failed or not-modified fetch on `documents`; returns the stored (content_type, s3_bucket, s3_key).
+    Raises after recording an error (a failed re-check leaves an already stored document `fetched`).
+    Successful fetches are recorded by `_arp_upload_fetched_source` once their bytes are in S3.
+    """
+    source_id = fetch.source_id
+    if fetch.status == "error":
         cur.execute(
             _arp_schema(
                 """
                 UPDATE "__ARP_SCHEMA__".documents
-                SET status='error', error=%s, fetched_at=now()
+                SET status=CASE WHEN status='fetched' AND s3_key<>'' THEN status ELSE 'error' END,
+                    error=%s, fetched_at=now(), checked_at=now()
                 WHERE source_id=%s;
                 """
             ).strip(),
-            (msg, source_id),
+            (fetch.error, source_id),
         )
-        raise RuntimeError(msg)
+        raise RuntimeError(fetch.error)
+
+    cur.execute(
+        _arp_schema(
+            """
+            UPDATE "__ARP_SCHEMA__".documents
+            SET checked_at=now(), etag=%s, last_modified=%s
+            WHERE source_id=%s
+            RETURNING content_type, s3_bucket, s3_key;
+            """
+        ).strip(),
+        (fetch.etag, fetch.last_modified, source_id),
+    )
+    row = cur.fetchone()
+    if not row:
+        raise RuntimeError("Unknown source")
+    return str(row[0] or ""), str(row[1] or ""), str(row[2] or "")
 
-    try:
-        resp = requests.get(u, timeout=45, headers={"User-Agent": "ETI360/1.0"})
-        resp.raise_for_status()
-        raw = resp.content
-    except Exception as e:
-        cur.execute(
-            _arp_schema(
-                """
-                UPDATE "__ARP_SCHEMA__".documents
-                SET status='error', error=%s, fetched_at=now()
-                WHERE source_id=%s;
-                """
-            ).strip(),
-            (str(e), source_id),
-        )
-        raise
 
-    header_ct = str(resp.headers.get("Content-Type") or "")
-    ctype = guess_content_type(url=url, header_content_type=header_ct)
+def _arp_upload_fetched_source(*, fetch: FetchResult, ctype: str, digest: str, s3_prefix: str) -> str:
+    """
+    Store a fetched body in the artifact store and mark its document `fetched` (own transaction).
+    Runs on `_arp_upload_executor` while the caller parses the same bytes. Returns the S3 key.
+    """
+    source_id = fetch.source_id
+    raw = fetch.raw
     s3cfg = get_s3_config()
-    key, mime = _arp_s3_key(prefix=s3cfg.prefix or s3_prefix, source_id=source_id, content_type=ctype)
-    put_bytes(region=s3cfg.region, bucket=s3cfg.bucket, key=key, body=raw, content_type=mime)
-    digest = sha256_hex(raw)
+    name, mime = _arp_s3_key(prefix=s3cfg.prefix or s3_prefix, source_id=source_id, content_type=ctype)
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            # Unchanged re-fetches resolve to the existing blob and skip the PUT.
+            blob = _store_artifact(
+                cur,
+                region=s3cfg.region,
+                bucket=s3cfg.bucket,
+                prefix=s3cfg.prefix or s3_prefix,
+                body=raw,
+                content_type=mime,
+                name=name,
+                digest=digest,
+            )
+            cur.execute(
+                _arp_schema(
+                    """
+                    UPDATE "__ARP_SCHEMA__".documents
+                    SET status='fetched',
+                        content_type=%s,
+                        fetched_at=now(),
+                        checked_at=now(),
+                        sha256=%s,
+                        bytes_size=%s,
+                        s3_bucket=%s,
+                        s3_key=%s,
+                        etag=%s,
+                        last_modified=%s,
+                        error=''
+                    WHERE source_id=%s;
+                    """
+                ).strip(),
+                (ctype, digest, int(len(raw)), s3cfg.bucket, blob.s3_key, fetch.etag, fetch.last_modified, source_id),
+            )
+        conn.commit()
+    return blob.s3_key
+
+
+_ARP_CHUNK_COLUMNS = (
+    "chunk_id",
+    "activity_id",
+    "source_id",
+    "heading",
+    "text",
+    "jurisdiction",
+    "authority_class",
+    "publication_date",
+    "loc",
+)
+
 
+def _arp_replace_source_chunks(cur: psycopg.Cursor, *, source_id: str, chunks: list[dict[str, Any]]) -> dict[str, int]:
+    """
+    Make `chunks` the complete chunk set for `source_id` on the caller's transaction: COPY into a
+    temp staging table, upsert changed rows in one statement, delete chunks no longer produced.
+    """
+    cols = ", ".join(_ARP_CHUNK_COLUMNS)
     cur.execute(
         _arp_schema(
+            f"""
+            CREATE TEMP TABLE IF NOT EXISTS arp_chunks_stage ON COMMIT DROP AS
+            SELECT {cols} FROM "__ARP_SCHEMA__".chunks WITH NO DATA;
             """
-            UPDATE "__ARP_SCHEMA__".documents
-            SET status='fetched',
-                content_type=%s,
-                fetched_at=now(),
-                sha256=%s,
-                bytes_size=%s,
-                s3_bucket=%s,
-                s3_key=%s,
-                error=''
-            WHERE source_id=%s;
+        ).strip()
+    )
+    cur.execute("TRUNCATE arp_chunks_stage;")
+    with cur.copy(f"COPY arp_chunks_stage ({cols}) FROM STDIN") as copy:
+        for c in chunks:
+            copy.write_row(tuple(c[k] for k in _ARP_CHUNK_COLUMNS))
+    # DISTINCT ON: a section repeated verbatim yields the same chunk_id twice.
+    cur.execute(
+        _arp_schema(
+            f"""
+            INSERT INTO "__ARP_SCHEMA__".chunks ({cols})
+            SELECT DISTINCT ON (chunk_id) {cols} FROM arp_chunks_stage ORDER BY chunk_id
+            ON CONFLICT (chunk_id) DO UPDATE SET
+              text=EXCLUDED.text,
+              heading=EXCLUDED.heading,
+              jurisdiction=EXCLUDED.jurisdiction,
+              authority_class=EXCLUDED.authority_class,
+              publication_date=EXCLUDED.publication_date
+            WHERE (chunks.text, chunks.heading, chunks.jurisdiction, chunks.authority_class, chunks.publication_date)
+              IS DISTINCT FROM
+              (EXCLUDED.text, EXCLUDED.heading, EXCLUDED.jurisdiction, EXCLUDED.authority_class, EXCLUDED.publication_date);
+            """
+        ).strip()
+    )
+    upserted = int(cur.rowcount or 0)
+    cur.execute(
+        _arp_schema(
+            """
+            DELETE FROM "__ARP_SCHEMA__".chunks c
+            WHERE c.source_id=%s
+              AND NOT EXISTS (SELECT 1 FROM arp_chunks_stage s WHERE s.chunk_id = c.chunk_id);
             """
         ).strip(),
-        (ctype, digest, int(len(raw)), s3cfg.bucket, key, source_id),
+        (source_id,),
     )
-    return ctype, s3cfg.bucket, key, int(len(raw))
+    return {"upserted": upserted, "deleted": int(cur.rowcount or 0)}
 
 
-def _arp_prepare_activity(*, activity_id: int, job_id: str, only_missing: bool = True) -> dict[str, Any]:
+def _arp_prepare_activity(*, activity_id: int, job_id: str, only_missing: bool = True, refresh: bool = False) -> dict[str, Any]:
+    """
+    Fetch, parse and chunk an activity's sources.
+
+    Network fetches run concurrently on the shared `app.arp_fetch` pool, at most ARP_FETCH_CONCURRENCY
+    ahead of the source being persisted (so peak memory is a window of bodies, not the whole
+    activity); each source is persisted in its own short transaction once its fetch is done. Fetched
+    bytes go straight to the parser while their S3 upload runs in the background; only sources
+    stored by an earlier run are read back from S3. With `refresh`, already-fetched sources are re-checked with
+    conditional GETs and only re-parsed if they changed.
+    """
     s3cfg = get_s3_config()
     with _connect() as conn:
         with conn.cursor() as cur:
@@ -588,7 +1671,7 @@ def _arp_prepare_activity(*, activity_id: int, job_id: str, only_missing: bool =
                 _arp_schema(
                     """
                     SELECT s.source_id, s.url, s.jurisdiction, s.authority_class, s.publication_date, s.source_type,
-                           d.status, d.content_type, d.s3_bucket, d.s3_key
+                           d.status, d.content_type, d.s3_bucket, d.s3_key, d.etag, d.last_modified, d.sha256
                     FROM "__ARP_SCHEMA__".sources s
                     LEFT JOIN "__ARP_SCHEMA__".documents d ON d.source_id = s.source_id
                     WHERE s.activity_id=%s
@@ -614,40 +1697,101 @@ def _arp_prepare_activity(*, activity_id: int, job_id: str, only_missing: bool =
 
         conn.commit()
 
+    def stored(d_status: Any, d_bucket: Any, d_key: Any) -> bool:
+        return str(d_status or "") == "fetched" and bool(str(d_bucket or "")) and bool(str(d_key or ""))
+
+    to_fetch: list[tuple[str, str, str, str]] = []
+    for source_id, url, _, _, _, _, d_status, _, d_bucket, d_key, d_etag, d_last_modified, _ in sources:
+        sid = str(source_id)
+        if not stored(d_status, d_bucket, d_key):
+            to_fetch.append((sid, str(url or ""), "", ""))
+        elif refresh:
+            to_fetch.append((sid, str(url or ""), str(d_etag or ""), str(d_last_modified or "")))
+    window = fetch_concurrency()
+    fetches: dict[str, Future[FetchResult]] = {}
+    next_fetch = 0
+    if to_fetch:
+        _job_append_log_safe(job_id=job_id, line=f"Fetching {len(to_fetch)} sources (concurrency={window})")
+
     prepared = 0
     chunks_added = 0
     skipped = 0
     errors: list[str] = []
-
-    for idx, (source_id, url, jurisdiction, authority_class, publication_date, source_type, d_status, d_ctype, d_bucket, d_key) in enumerate(
-        sources, start=1
-    ):
+    uploads: dict[str, Future[str]] = {}
+
+    for idx, (
+        source_id,
+        url,
+        jurisdiction,
+        authority_class,
+        publication_date,
+        source_type,
+        d_status,
+        d_ctype,
+        d_bucket,
+        d_key,
+        _,
+        _,
+        d_sha,
+    ) in enumerate(sources, start=1):
+        sid = str(source_id)
+        # Bound the bytes held in memory: uploads still queued keep their body until they run.
+        pending = [f for f in uploads.values() if not f.done()]
+        if len(pending) >= window:
+            wait(pending, return_when=FIRST_COMPLETED)
+        # Keep up to `window` fetches in flight ahead of this source (`to_fetch` is in source order).
+        while next_fetch < len(to_fetch) and len(fetches) < window:
+            fetches.update(fetch_many(to_fetch[next_fetch : next_fetch + 1]))
+            next_fetch += 1
+        # Wait for this source's fetch (if any) before taking a connection; the future is dropped here.
+        fut = fetches.pop(sid, None)
+        fetch = fut.result() if fut is not None else None
+        fut = None
         with _connect() as conn:
             with conn.cursor() as cur:
                 _ensure_arp_tables(cur)
                 _job_append_log(cur, job_id=job_id, line=f"[{idx}/{len(sources)}] {source_id}")
                 try:
-                    sid = str(source_id)
                     existing_chunks = int(chunks_by_source.get(sid, 0))
-                    if only_missing and str(d_status or "") == "fetched" and existing_chunks > 0:
+                    if fetch is None and only_missing and str(d_status or "") == "fetched" and existing_chunks > 0:
                         skipped += 1
                         _job_append_log(cur, job_id=job_id, line=f"skip (already fetched; chunks={existing_chunks})")
                         conn.commit()
                         continue
 
-                    # Prefer re-parsing from existing S3 object if already fetched, to avoid repeated external downloads.
                     ctype = str(d_ctype or "")
                     bucket = str(d_bucket or "")
                     key = str(d_key or "")
-                    if str(d_status or "") == "fetched" and bucket and key:
-                        raw = get_bytes(region=s3cfg.region, bucket=bucket, key=key, max_bytes=15 * 1024 * 1024)
-                        if not ctype:
-                            ctype = guess_content_type(url=str(url), header_content_type="")
-                    else:
-                        ctype, bucket, key, _ = _arp_fetch_and_store_source(
-                            cur, source_id=sid, url=str(url), job_id=job_id, s3_prefix=s3cfg.prefix
-                        )
+                    raw: bytes | None = None
+                    if fetch is not None:
+                        _job_append_log(cur, job_id=job_id, line=f"Fetch: {source_id} ({fetch.status})")
+                        if fetch.status == "ok":
+                            digest = sha256_hex(fetch.raw)
+                            unchanged = digest == str(d_sha or "") and bool(key)
+                        else:
+                            ctype, bucket, key = _arp_record_fetch_status(cur, fetch=fetch)
+                            unchanged = True
+                        if unchanged and existing_chunks > 0:
+                            # 304, or identical bytes: chunks are current.
+                            skipped += 1
+                            _job_append_log(cur, job_id=job_id, line=f"skip (unchanged; chunks={existing_chunks})")
+                            if fetch.status == "ok":
+                                uploads[sid] = _arp_upload_executor().submit(
+                                    _arp_upload_fetched_source, fetch=fetch, ctype=ctype, digest=digest, s3_prefix=s3cfg.prefix
+                                )
+                            conn.commit()
+                            continue
+                        if fetch.status == "ok":
+                            ctype = guess_content_type(url=fetch.url, header_content_type=fetch.header_content_type)
+                            raw = fetch.raw
+                            uploads[sid] = _arp_upload_executor().submit(
+                                _arp_upload_fetched_source, fetch=fetch, ctype=ctype, digest=digest, s3_prefix=s3cfg.prefix
+                            )
+                    if raw is None:
+                        # Stored by an earlier run: parse from S3 rather than downloading the source again.
                         raw = get_bytes(region=s3cfg.region, bucket=bucket, key=key, max_bytes=15 * 1024 * 1024)
+                    if not ctype:
+                        ctype = guess_content_type(url=str(url), header_content_type="")
 
                     if ctype == "pdf":
                         doc = parse_pdf_bytes(sid, raw)
@@ -663,33 +1807,11 @@ def _arp_prepare_activity(*, activity_id: int, job_id: str, only_missing: bool =
                         doc=doc,
                     )
 
-                    for c in chunks:
-                        cur.execute(
-                            _arp_schema(
-                                """
-                                INSERT INTO "__ARP_SCHEMA__".chunks
-                                  (chunk_id, activity_id, source_id, heading, text, jurisdiction, authority_class, publication_date, loc)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                ON CONFLICT (chunk_id) DO UPDATE SET
-                                  text=EXCLUDED.text,
-                                  heading=EXCLUDED.heading,
-                                  jurisdiction=EXCLUDED.jurisdiction,
-                                  authority_class=EXCLUDED.authority_class,
-                                  publication_date=EXCLUDED.publication_date;
-                                """
-                            ).strip(),
-                            (
-                                c["chunk_id"],
-                                c["activity_id"],
-                                c["source_id"],
-                                c["heading"],
-                                c["text"],
-                                c["jurisdiction"],
-                                c["authority_class"],
-                                c["publication_date"],
-                                c["loc"],
-                            ),
-                        )
+                    # Savepoint: a failed merge leaves the source's previous chunks and still logs the error.
+                    with conn.transaction():
+                        merged = _arp_replace_source_chunks(cur, source_id=sid, chunks=chunks)
+                    if merged["deleted"]:
+                        _job_append_log(cur, job_id=job_id, line=f"removed {merged['deleted']} stale chunks")
                     prepared += 1
                     chunks_added += len(chunks)
                 except Exception as e:
@@ -697,6 +1819,14 @@ def _arp_prepare_activity(*, activity_id: int, job_id: str, only_missing: bool =
                     _job_append_log(cur, job_id=job_id, line=f"ERROR: {source_id}: {e}")
                 conn.commit()
 
+    # The activity counts as prepared only once its fetched sources are durably stored.
+    for sid, fut in uploads.items():
+        try:
+            fut.result()
+        except Exception as e:
+            errors.append(f"{sid}: upload failed: {e}")
+            _job_append_log_safe(job_id=job_id, line=f"ERROR: {sid}: upload failed: {e}")
+
     return {
         "activity_id": int(activity_id),
         "activity_name": str(activity_name),
@@ -738,6 +1868,48 @@ def _arp_writer_input_md(activity_name: str, extracted: dict[str, list[dict[str,
     return "\n".join(parts).strip() + "\n"
 
 
+def _arp_search_chunks(
+    cur: psycopg.Cursor, *, query: str, activity_id: int | None = None, top_k: int = 12
+) -> list[dict[str, Any]]:
+    """
+    Rank chunks against `query` with the `chunks.tsv` GIN index (any query term may match;
+    ts_rank_cd with length normalization). `activity_id=None` searches across all activities.
+    """
+    cur.execute(
+        _arp_schema(
+            """
+            WITH q AS (
+              SELECT replace(plainto_tsquery('english', %s)::text, ' & ', ' | ')::tsquery AS q
+            )
+            SELECT c.chunk_id, c.activity_id, c.source_id, c.heading, c.text, c.jurisdiction, c.authority_class,
+                   c.publication_date, ts_rank_cd(c.tsv, q.q, 1) AS score
+            FROM "__ARP_SCHEMA__".chunks c, q
+            WHERE c.tsv @@ q.q
+              AND (%s::int IS NULL OR c.activity_id = %s::int)
+            ORDER BY score DESC, c.chunk_id ASC
+            LIMIT %s;
+            """
+        ).strip(),
+        (query or "", activity_id, activity_id, max(1, int(top_k))),
+    )
+    return [
+        {
+            "chunk_id": str(chunk_id),
+            "activity_id": int(aid),
+            "source_id": str(source_id),
+            "heading": str(heading or ""),
+            "text": str(text or ""),
+            "jurisdiction": str(jurisdiction or ""),
+            "authority_class": str(authority_class or ""),
+            "publication_date": str(publication_date or ""),
+            "score": float(score or 0.0),
+        }
+        for chunk_id, aid, source_id, heading, text, jurisdiction, authority_class, publication_date, score in (
+            cur.fetchall() or []
+        )
+    ]
+
+
 def _arp_generate_activity(*, activity_id: int, top_k: int, job_id: str) -> dict[str, Any]:
     with _connect() as conn:
         with conn.cursor() as cur:
@@ -763,43 +1935,49 @@ def _arp_generate_activity(*, activity_id: int, top_k: int, job_id: str) -> dict
             row2 = cur.fetchone()
             scope_notes = str(row2[0] or "") if row2 else ""
 
-            cur.execute(
-                _arp_schema(
-                    """
-                    SELECT chunk_id, heading, text, jurisdiction, authority_class, publication_date
-                    FROM "__ARP_SCHEMA__".chunks
-                    WHERE activity_id=%s;
-                    """
-                ).strip(),
-                (activity_id,),
-            )
-            chunks = list(cur.fetchall())
+            # Top-k straight from the persisted full-text index (see `_arp_search_chunks`).
+            selected = _arp_search_chunks(cur, query=str(activity_name), activity_id=int(activity_id), top_k=int(top_k))
+            chunks: list[Any] = []
+            if not selected:
+                # No full-text match (e.g. a name of only stopwords): rank the activity's chunks in memory.
+                cur.execute(
+                    _arp_schema(
+                        """
+                        SELECT chunk_id, heading, text, jurisdiction, authority_class, publication_date
+                        FROM "__ARP_SCHEMA__".chunks
+                        WHERE activity_id=%s;
+                        """
+                    ).strip(),
+                    (activity_id,),
+                )
+                chunks = list(cur.fetchall())
         conn.commit()
 
-    if not chunks:
+    if not selected and not chunks:
         with _connect() as conn:
             with conn.cursor() as cur:
                 _job_append_log(cur, job_id=job_id, line="No chunks found; run Prepare first.")
             conn.commit()
         raise RuntimeError("No chunks found (prepare evidence first).")
 
-    idx = BM25Index()
-    by_id: dict[str, dict[str, Any]] = {}
-    for chunk_id, heading, text, jurisdiction, authority_class, publication_date in chunks:
-        cid = str(chunk_id)
-        by_id[cid] = {
-            "chunk_id": cid,
-            "heading": str(heading or ""),
-            "text": str(text or ""),
-            "jurisdiction": str(jurisdiction or ""),
-            "authority_class": str(authority_class or ""),
-            "publication_date": str(publication_date or ""),
-        }
-        idx.add(cid, str(text or ""))
+    if not selected:
+        _job_append_log_safe(job_id=job_id, line="No full-text matches; ranking chunks with BM25")
+        by_id: dict[str, dict[str, Any]] = {}
+        for chunk_id, heading, text, jurisdiction, authority_class, publication_date in chunks:
+            cid = str(chunk_id)
+            by_id[cid] = {
+                "chunk_id": cid,
+                "heading": str(heading or ""),
+                "text": str(text or ""),
+                "jurisdiction": str(jurisdiction or ""),
+                "authority_class": str(authority_class or ""),
+                "publication_date": str(publication_date or ""),
+            }
+        idx = BM25Index.build((cid, c["text"], None) for cid, c in by_id.items())
 
-    results = idx.query(str(activity_name), top_k=int(top_k))
-    selected_ids = [str(r.get("id")) for r in results if r.get("id")]
-    selected = [by_id[cid] for cid in selected_ids if cid in by_id]
+        results = idx.query(str(activity_name), top_k=int(top_k))
+        selected_ids = [str(r.get("id")) for r in results if r.get("id")]
+        selected = [by_id[cid] for cid in selected_ids if cid in by_id]
 
     model_extract = os.environ.get("OPENAI_MODEL_ARP_EXTRACT", "").strip() or os.environ.get("OPENAI_MODEL", "").strip() or "gpt-5-mini"
     model_write = os.environ.get("OPENAI_MODEL_ARP_WRITE", "").strip() or os.environ.get("OPENAI_MODEL", "").strip() or "gpt-5-mini"
@@ -853,7 +2031,7 @@ def _arp_generate_activity(*, activity_id: int, top_k: int, job_id: str) -> dict
                     _job_append_log(cur, job_id=job_id, line=f"Extract error: {e}")
                 conn.commit()
 
-    _record_llm_usage(
+    extract_usage = _record_llm_usage(
         run_id=run_id,
         workflow="arp",
         kind="extract",
@@ -890,7 +2068,7 @@ def _arp_generate_activity(*, activity_id: int, top_k: int, job_id: str) -> dict
         arp_json = write.payload or {}
         ok, err = validate_arp_json(arp_json)
 
-    _record_llm_usage(
+    write_usage = _record_llm_usage(
         run_id=run_id,
         workflow="arp",
         kind="write",
@@ -949,7 +2127,13 @@ def _arp_generate_activity(*, activity_id: int, top_k: int, job_id: str) -> dict
                 _job_append_log(cur, job_id=job_id, line=f"Icon skipped: {e}")
             conn.commit()
 
-    return {"activity_id": int(activity_id), "activity_slug": str(activity_slug), "report_url": f"/arp/report/{quote(str(activity_slug))}"}
+    return {
+        "activity_id": int(activity_id),
+        "activity_slug": str(activity_slug),
+        "report_url": f"/arp/report/{quote(str(activity_slug))}",
+        "run_id": run_id,
+        "cost_usd": float(extract_usage.get("cost_usd") or 0.0) + float(write_usage.get("cost_usd") or 0.0),
+    }
 
 
 def _arp_upsert_activity_icon(
@@ -998,6 +2182,7 @@ def _arp_upsert_activity_icon(
     if job_id:
         _job_append_log_safe(job_id=job_id, line=f"Icon: classify (model={model_icon})")
     run_id = _create_run_id()
+    db.release_request_connection()
     res = chat_json(model=model_icon, system=ICON_CLASSIFY_SYSTEM, user=user_prompt, temperature=0.0)
 
     spec_raw = res.payload or {}
@@ -1057,6 +2242,84 @@ def _job_append_log_safe(*, job_id: str, line: str) -> None:
         conn.commit()
 
 
+def _jobs_fanout_enabled() -> bool:
+    return (os.environ.get("JOBS_FANOUT", "1") or "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _job_spawn_children(*, parent_id: str, kind: str, payloads: list[dict[str, Any]]) -> int:
+    """
+    Enqueue one `kind` child per payload and park the parent in 'waiting' (one transaction).
+    Each payload gets an `index` so the parent can aggregate in the original order.
+    """
+    schema = _jobs_schema_name()
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                INSERT INTO "{schema}".jobs (kind, payload, created_by, priority, parent_id)
+                SELECT %s, p, parent.created_by, parent.priority, parent.id
+                FROM unnest(%s::jsonb[]) AS p, (SELECT created_by, priority, id FROM "{schema}".jobs WHERE id=%s) AS parent;
+                """,
+                (kind, [json.dumps({**p, "index": i}) for i, p in enumerate(payloads)], parent_id),
+            )
+            cur.execute(f"UPDATE \"{schema}\".jobs SET status='waiting', heartbeat_at=now() WHERE id=%s;", (parent_id,))
+            _job_append_log(cur, job_id=parent_id, line=f"Fan-out: {len(payloads)} {kind} child jobs; waiting for them to finish")
+            _job_log_close(cur, job_id=parent_id)
+            db.notify(cur, _JOBS_CHANNEL, f"queued:{parent_id}")
+            db.notify(cur, _JOB_EVENTS_CHANNEL, parent_id)
+        conn.commit()
+    return len(payloads)
+
+
+def _job_children(parent_id: str) -> list[dict[str, Any]]:
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""
+                SELECT id, status, payload, result, error
+                FROM "{_jobs_schema_name()}".jobs
+                WHERE parent_id=%s
+                ORDER BY (payload->>'index')::int ASC NULLS LAST, created_at ASC;
+                """,
+                (parent_id,),
+            )
+            return [
+                {"id": str(jid), "status": st, "payload": pl or {}, "result": res or {}, "error": err or ""}
+                for jid, st, pl, res, err in (cur.fetchall() or [])
+            ]
+
+
+def _job_finish(job_id: str, *, result: dict[str, Any] | None = None, error: str = "") -> None:
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            if error:
+                _job_finish_error(cur, job_id=job_id, error=error)
+            else:
+                _job_finish_ok(cur, job_id=job_id, result=result or {})
+        conn.commit()
+
+
+def _arp_prepare_checkpointed(*, job_id: str, activity_id: int, done: dict[str, Any], refresh: bool = False) -> dict[str, Any]:
+    key = str(activity_id)
+    if key in done:
+        _job_append_log_safe(job_id=job_id, line=f"skip activity_id={activity_id} (checkpoint)")
+        return done[key]
+    res = _arp_prepare_activity(activity_id=activity_id, job_id=job_id, only_missing=True, refresh=refresh)
+    _job_checkpoint(job_id, step="prepare", item=key, result=res)
+    return res
+
+
+def _arp_generate_checkpointed(*, job_id: str, activity_id: int, top_k: int, done: dict[str, Any]) -> dict[str, Any]:
+    # Generation is the expensive (LLM) step; a resumed job never pays for it twice.
+    key = str(activity_id)
+    if key in done:
+        _job_append_log_safe(job_id=job_id, line=f"skip generate activity_id={activity_id} (checkpoint)")
+        return done[key]
+    res = _arp_generate_activity(activity_id=activity_id, top_k=top_k, job_id=job_id)
+    _job_checkpoint(job_id, step="generate", item=key, result=res)
+    return res
+
+
 def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
     if kind == "weather_auto_batch":
         locations = payload.get("locations") if isinstance(payload, dict) else None
@@ -1069,22 +2332,88 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
                 conn.commit()
             return
 
+        children = _job_children(job_id)
+        if not children and _jobs_fanout_enabled() and len(locs) > 1:
+            payloads = [{"location": q, "force_refresh": force_refresh} for q in locs]
+            _job_spawn_children(parent_id=job_id, kind="weather_auto_one", payloads=payloads)
+            return
+
         with _connect() as conn:
             with conn.cursor() as cur:
-                _job_append_log(cur, job_id=job_id, line=f"Starting weather_auto_batch: {len(locs)} locations")
+                if children:
+                    _job_append_log(cur, job_id=job_id, line=f"Aggregating weather_auto_batch: {len(children)} child jobs")
+                else:
+                    _job_append_log(cur, job_id=job_id, line=f"Starting weather_auto_batch: {len(locs)} locations")
             conn.commit()
 
+        outcomes: dict[str, Any] | None = None
+        if children:
+            outcomes = {}
+            for c in children:
+                q = str(c["payload"].get("location") or "")
+                outcomes[q] = c["result"] if c["status"] == "ok" else {"error": c["error"] or c["status"]}
+
         try:
-            result = _run_weather_auto_batch(locations=locs, force_refresh=force_refresh, job_id=job_id)
+            result = _run_weather_auto_batch(locations=locs, force_refresh=force_refresh, job_id=job_id, outcomes=outcomes)
             with _connect() as conn:
                 with conn.cursor() as cur:
                     _job_finish_ok(cur, job_id=job_id, result=result)
                 conn.commit()
         except Exception as e:
-            with _connect() as conn:
-                with conn.cursor() as cur:
-                    _job_finish_error(cur, job_id=job_id, error=str(getattr(e, "detail", e)))
-                conn.commit()
+            with _connect() as conn:
+                with conn.cursor() as cur:
+                    _job_finish_error(cur, job_id=job_id, error=str(getattr(e, "detail", e)))
+                conn.commit()
+        return
+
+    if kind == "weather_auto_one":
+        # Child of a fanned-out weather_auto_batch; usage is recorded once by the parent.
+        q = str(payload.get("location") or "").strip() if isinstance(payload, dict) else ""
+        force_refresh = bool(payload.get("force_refresh")) if isinstance(payload, dict) else False
+        if not q:
+            _job_finish(job_id, error="No location in job payload")
+            return
+        _job_append_log_safe(job_id=job_id, line=f"weather_auto_one: {q}")
+        try:
+            res, tok, model, wtok, wmodel, dtok, dmodel = _auto_generate_one(location_query=q, force_refresh=force_refresh)
+            _job_finish(
+                job_id,
+                result={"res": res, "tok": tok, "model": model, "wtok": wtok, "wmodel": wmodel, "dtok": dtok, "dmodel": dmodel},
+            )
+        except Exception as e:
+            _job_finish(job_id, error=str(getattr(e, "detail", e)) or type(e).__name__)
+        return
+
+    if kind == "arp_prepare_one":
+        # Child of a fanned-out arp_prepare: prepare (and optionally generate) one activity.
+        try:
+            aid = int(payload.get("activity_id")) if isinstance(payload, dict) else 0
+        except Exception:
+            aid = 0
+        if aid <= 0:
+            _job_finish(job_id, error="No activity_id in job payload")
+            return
+        top_k = max(1, min(int(payload.get("top_k") or 12), 50))
+        auto_generate = bool(payload.get("auto_generate"))
+        refresh = bool(payload.get("refresh_sources"))
+        try:
+            prep = _arp_prepare_checkpointed(
+                job_id=job_id, activity_id=aid, done=_job_checkpoints(job_id, step="prepare"), refresh=refresh
+            )
+            gen: dict[str, Any] | None = None
+            gen_error = ""
+            if auto_generate:
+                _job_append_log_safe(job_id=job_id, line=f"generate activity_id={aid}")
+                try:
+                    gen = _arp_generate_checkpointed(
+                        job_id=job_id, activity_id=aid, top_k=top_k, done=_job_checkpoints(job_id, step="generate")
+                    )
+                except Exception as e:
+                    gen_error = str(getattr(e, "detail", e))
+                    _job_append_log_safe(job_id=job_id, line=f"ERROR: generate activity_id={aid}: {gen_error}")
+            _job_finish(job_id, result={"activity_id": aid, "prepare": prep, "generate": gen, "error": gen_error})
+        except Exception as e:
+            _job_finish(job_id, error=str(getattr(e, "detail", e)) or type(e).__name__)
         return
 
     if kind == "arp_prepare":
@@ -1100,6 +2429,7 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
             auto_generate = auto_generate_raw
         else:
             auto_generate = str(auto_generate_raw or "").strip().lower() in {"1", "true", "yes", "on"}
+        refresh = bool(payload.get("refresh_sources")) if isinstance(payload, dict) else False
 
         activity_ids = [int(x) for x in (ids or []) if str(x).strip().isdigit()]
         if not activity_ids:
@@ -1109,6 +2439,44 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
                 conn.commit()
             return
 
+        children = _job_children(job_id)
+        if not children and _jobs_fanout_enabled() and len(activity_ids) > 1:
+            payloads = [
+                {"activity_id": aid, "auto_generate": auto_generate, "top_k": top_k, "refresh_sources": refresh}
+                for aid in activity_ids
+            ]
+            _job_spawn_children(parent_id=job_id, kind="arp_prepare_one", payloads=payloads)
+            return
+        if children:
+            prepare_results = []
+            generate_results = []
+            errors = []
+            for c in children:
+                aid = c["payload"].get("activity_id")
+                if c["status"] != "ok":
+                    errors.append(f"{aid}: {c['error'] or c['status']}")
+                    continue
+                prepare_results.append(c["result"].get("prepare") or {})
+                if c["result"].get("generate"):
+                    generate_results.append(c["result"]["generate"])
+                if c["result"].get("error"):
+                    errors.append(f"{aid}: {c['result']['error']}")
+            _job_append_log_safe(job_id=job_id, line=f"Aggregated {len(children)} child jobs ({len(errors)} errors)")
+            _job_finish(
+                job_id,
+                result={
+                    "ok": True,
+                    "auto_generate": bool(auto_generate),
+                    "results": prepare_results,
+                    "prepare_results": prepare_results,
+                    "generate_results": generate_results,
+                    "errors": errors,
+                    "children": len(children),
+                    "llm_cost_usd": float(sum(float(g.get("cost_usd") or 0.0) for g in generate_results)),
+                },
+            )
+            return
+
         with _connect() as conn:
             with conn.cursor() as cur:
                 _job_append_log(
@@ -1122,12 +2490,16 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
             prepare_results = []
             generate_results: list[dict[str, Any]] = []
             errors: list[str] = []
+            prepared = _job_checkpoints(job_id, step="prepare")
+            generated = _job_checkpoints(job_id, step="generate")
             for i, aid in enumerate(activity_ids, start=1):
                 with _connect() as conn:
                     with conn.cursor() as cur:
                         _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(activity_ids)}] activity_id={aid}")
                     conn.commit()
-                prepare_results.append(_arp_prepare_activity(activity_id=int(aid), job_id=job_id, only_missing=True))
+                prepare_results.append(
+                    _arp_prepare_checkpointed(job_id=job_id, activity_id=int(aid), done=prepared, refresh=refresh)
+                )
 
             if auto_generate:
                 for i, aid in enumerate(activity_ids, start=1):
@@ -1136,7 +2508,9 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
                             _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(activity_ids)}] generate activity_id={aid}")
                         conn.commit()
                     try:
-                        generate_results.append(_arp_generate_activity(activity_id=int(aid), top_k=top_k, job_id=job_id))
+                        generate_results.append(
+                            _arp_generate_checkpointed(job_id=job_id, activity_id=int(aid), top_k=top_k, done=generated)
+                        )
                     except Exception as e:
                         msg = str(getattr(e, "detail", e))
                         errors.append(f"{aid}: {msg}")
@@ -1193,13 +2567,15 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
         errors: list[str] = []
 
         try:
+            prepared = _job_checkpoints(job_id, step="prepare")
+            generated = _job_checkpoints(job_id, step="generate")
             # 1) Prepare evidence (missing-only, reuses existing S3)
             for i, aid in enumerate(activity_ids, start=1):
                 with _connect() as conn:
                     with conn.cursor() as cur:
                         _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(activity_ids)}] prepare activity_id={aid}")
                     conn.commit()
-                prepare_results.append(_arp_prepare_activity(activity_id=int(aid), job_id=job_id, only_missing=True))
+                prepare_results.append(_arp_prepare_checkpointed(job_id=job_id, activity_id=int(aid), done=prepared))
 
             # 2) Generate reports
             for i, aid in enumerate(activity_ids, start=1):
@@ -1208,7 +2584,9 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
                         _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(activity_ids)}] generate activity_id={aid}")
                     conn.commit()
                 try:
-                    generate_results.append(_arp_generate_activity(activity_id=int(aid), top_k=top_k, job_id=job_id))
+                    generate_results.append(
+                        _arp_generate_checkpointed(job_id=job_id, activity_id=int(aid), top_k=top_k, done=generated)
+                    )
                 except Exception as e:
                     msg = str(getattr(e, "detail", e))
                     errors.append(f"{aid}: {msg}")
@@ -1256,12 +2634,13 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
 
         try:
             results = []
+            generated = _job_checkpoints(job_id, step="generate")
             for i, aid in enumerate(activity_ids, start=1):
                 with _connect() as conn:
                     with conn.cursor() as cur:
                         _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(activity_ids)}] activity_id={aid}")
                     conn.commit()
-                results.append(_arp_generate_activity(activity_id=int(aid), top_k=top_k, job_id=job_id))
+                results.append(_arp_generate_checkpointed(job_id=job_id, activity_id=int(aid), top_k=top_k, done=generated))
             with _connect() as conn:
                 with conn.cursor() as cur:
                     _job_finish_ok(cur, job_id=job_id, result={"ok": True, "results": results})
@@ -1279,6 +2658,7 @@ def _run_job(*, job_id: str, kind: str, payload: dict[str, Any]) -> None:
         conn.commit()
 
 
+@_schema_step("usage")
 def _ensure_usage_tables(cur: psycopg.Cursor) -> None:
     """
     Ensure the shared usage tables exist in USAGE_SCHEMA.
@@ -1392,11 +2772,22 @@ def _session_ttl_seconds() -> int:
     return days * 24 * 3600
 
 
+def _password_iterations() -> int:
+    # Raise over time; older hashes are upgraded on the next successful login.
+    return max(100_000, _env_int("PASSWORD_PBKDF2_ITERATIONS", 200_000))
+
+
 def _hash_password(password: str) -> str:
     password = (password or "").strip()
     if len(password) < 8:
         raise HTTPException(status_code=400, detail="Password must be at least 8 characters")
-    iterations = 200_000
+    return _pbkdf2_password_hash(password)
+
+
+def _pbkdf2_password_hash(password: str) -> str:
+    # No policy check: also used to upgrade the stored hash of an already-verified (possibly legacy) password.
+    password = (password or "").strip()
+    iterations = _password_iterations()
     salt = token_bytes(16)
     dk = pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=32)
     return f"pbkdf2_sha256${iterations}${urlsafe_b64encode(salt).decode('ascii')}${urlsafe_b64encode(dk).decode('ascii')}"
@@ -1413,11 +2804,87 @@ def _verify_password(password: str, stored: str) -> bool:
         salt = urlsafe_b64decode(salt_b64.encode("ascii"))
         expected = urlsafe_b64decode(dk_b64.encode("ascii"))
         got = pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations, dklen=len(expected))
-        return got == expected
+        return hmac.compare_digest(got, expected)
     except Exception:
         return False
 
 
+def _password_needs_rehash(stored: str) -> bool:
+    try:
+        algo, iters_s, _, dk_b64 = (stored or "").strip().split("$", 3)
+        return algo != "pbkdf2_sha256" or int(iters_s) < _password_iterations() or len(urlsafe_b64decode(dk_b64.encode("ascii"))) != 32
+    except Exception:
+        return True
+
+
+_PASSWORD_EXECUTOR: ThreadPoolExecutor | None = None
+_PASSWORD_EXECUTOR_LOCK = threading.Lock()
+
+
+def _password_executor() -> ThreadPoolExecutor:
+    """
+    Small dedicated pool for PBKDF2 so hashing bursts can't occupy the DB/request threads.
+    """
+    global _PASSWORD_EXECUTOR
+    with _PASSWORD_EXECUTOR_LOCK:
+        if _PASSWORD_EXECUTOR is None:
+            workers = max(1, _env_int("PASSWORD_HASH_WORKERS", 2))
+            _PASSWORD_EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eti360-pbkdf2")
+        return _PASSWORD_EXECUTOR
+
+
+async def _verify_password_async(password: str, stored: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor(), _verify_password, password, stored)
+
+
+async def _rehash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor(), _pbkdf2_password_hash, password)
+
+
+class _LoginLimiter:
+    """
+    Per-username guard for password checks: one in-flight verify per username, and at most
+    LOGIN_MAX_ATTEMPTS attempts per LOGIN_WINDOW_SECONDS. Extra attempts get 429 before any
+    PBKDF2 work is scheduled.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._inflight: set[str] = set()
+        self._attempts: dict[str, deque[float]] = {}
+
+    def acquire(self, username: str) -> str:
+        key = (username or "").strip().lower()
+        max_attempts = max(1, _env_int("LOGIN_MAX_ATTEMPTS", 10))
+        window = max(1.0, _env_float("LOGIN_WINDOW_SECONDS", 60.0))
+        now = time.monotonic()
+        with self._lock:
+            if key in self._inflight:
+                raise HTTPException(status_code=429, detail="Login already in progress; try again shortly")
+            q = self._attempts.setdefault(key, deque())
+            while q and q[0] <= now - window:
+                q.popleft()
+            if len(q) >= max_attempts:
+                raise HTTPException(status_code=429, detail="Too many login attempts; try again later")
+            q.append(now)
+            self._inflight.add(key)
+            # Opportunistic cleanup so idle usernames don't accumulate.
+            if len(self._attempts) > 1000:
+                for k in [k for k, v in self._attempts.items() if not v or v[-1] <= now - window]:
+                    self._attempts.pop(k, None)
+        return key
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            self._inflight.discard(key)
+
+
+_LOGIN_LIMITER = _LoginLimiter()
+
+
+@_schema_step("auth")
 def _ensure_auth_tables(cur: psycopg.Cursor) -> None:
     """
     Create generic DB tables for users + sessions in AUTH_SCHEMA (default: ops).
@@ -1474,6 +2941,106 @@ def _ensure_auth_tables(cur: psycopg.Cursor) -> None:
     cur.execute(_auth_schema('CREATE INDEX IF NOT EXISTS sessions_expires_at_idx ON "__SCHEMA__".sessions(expires_at DESC);'))
 
 
+_AUTH_INVALIDATE_CHANNEL = "eti360_auth_invalidate"
+
+
+# Short TTL keeps instances that miss a NOTIFY (or manual SQL edits) eventually consistent.
+_SESSION_CACHE: TTLCache[dict[str, Any]] = TTLCache(
+    max_items=_env_int("SESSION_CACHE_MAX", 5000),
+    ttl_seconds=_env_float("SESSION_CACHE_TTL_SECONDS", 30.0),
+)
+_SESSION_TOUCHES: dict[uuid.UUID, datetime] = {}
+_SESSION_TOUCH_LOCK = threading.Lock()
+_SESSION_FLUSH_THREAD: threading.Thread | None = None
+
+
+def _session_touch_flush_seconds() -> float:
+    return max(1.0, _env_float("SESSION_TOUCH_FLUSH_SECONDS", 60.0))
+
+
+def _touch_session(sid_uuid: uuid.UUID) -> None:
+    """
+    Record a `last_seen_at` touch in memory; `_flush_session_touches` writes them in batches.
+    """
+    global _SESSION_FLUSH_THREAD
+    with _SESSION_TOUCH_LOCK:
+        _SESSION_TOUCHES[sid_uuid] = datetime.now(timezone.utc)
+        if _SESSION_FLUSH_THREAD and _SESSION_FLUSH_THREAD.is_alive():
+            return
+        t = threading.Thread(target=_session_touch_loop, name="eti360-session-touch", daemon=True)
+        t.start()
+        _SESSION_FLUSH_THREAD = t
+
+
+def _flush_session_touches() -> int:
+    with _SESSION_TOUCH_LOCK:
+        if not _SESSION_TOUCHES:
+            return 0
+        batch = dict(_SESSION_TOUCHES)
+        _SESSION_TOUCHES.clear()
+    ids = list(batch.keys())
+    seen = [batch[i] for i in ids]
+    try:
+        with _connect() as conn:
+            with conn.cursor() as cur:
+                _ensure_auth_tables(cur)
+                cur.execute(
+                    _auth_schema(
+                        """
+                        UPDATE "__SCHEMA__".sessions s
+                        SET last_seen_at = v.seen_at
+                        FROM unnest(%s::uuid[], %s::timestamptz[]) AS v(id, seen_at)
+                        WHERE s.id = v.id AND s.last_seen_at < v.seen_at;
+                        """
+                    ).strip(),
+                    (ids, seen),
+                )
+            conn.commit()
+    except Exception:
+        # Put the touches back (keeping any newer ones) so the next flush retries them.
+        with _SESSION_TOUCH_LOCK:
+            for sid, ts in batch.items():
+                if sid not in _SESSION_TOUCHES or _SESSION_TOUCHES[sid] < ts:
+                    _SESSION_TOUCHES[sid] = ts
+        raise
+    return len(ids)
+
+
+def _session_touch_loop() -> None:
+    while True:
+        time.sleep(_session_touch_flush_seconds())
+        try:
+            _flush_session_touches()
+        except Exception as e:
+            print(f"[auth] last_seen_at flush failed: {e}")
+
+
+def _invalidate_auth_cache(*, session_id: str = "", user_id: str = "", cur: psycopg.Cursor | None = None) -> None:
+    """
+    Drop cached sessions locally and, when a cursor is given, tell other instances via NOTIFY.
+    """
+    if session_id:
+        try:
+            _SESSION_CACHE.discard(uuid.UUID(session_id))
+        except Exception:
+            pass
+    if user_id:
+        _SESSION_CACHE.discard_where(lambda _k, v: str(v.get("user", {}).get("id") or "") == user_id)
+    if cur is not None:
+        payload = f"session:{session_id}" if session_id else (f"user:{user_id}" if user_id else "all")
+        db.notify(cur, _AUTH_INVALIDATE_CHANNEL, payload)
+
+
+def _on_auth_invalidate(payload: str | None) -> None:
+    kind, _, ident = (payload or "all").partition(":")
+    if kind == "session" and ident:
+        _invalidate_auth_cache(session_id=ident)
+    elif kind == "user" and ident:
+        _invalidate_auth_cache(user_id=ident)
+    else:
+        _SESSION_CACHE.clear()
+
+
 def _get_current_user(request: Request) -> dict[str, Any] | None:
     if _auth_disabled():
         return {"id": "disabled", "username": "disabled", "display_name": "Auth disabled", "role": "admin"}
@@ -1487,6 +3054,14 @@ def _get_current_user(request: Request) -> dict[str, Any] | None:
         return None
 
     now = datetime.now(timezone.utc)
+    cached = _SESSION_CACHE.get(sid_uuid)
+    if cached is not None:
+        if cached["expires_at"] and cached["expires_at"] <= now:
+            _SESSION_CACHE.discard(sid_uuid)
+            return None
+        _touch_session(sid_uuid)
+        return dict(cached["user"])
+
     with _connect() as conn:
         with conn.cursor() as cur:
             _ensure_auth_tables(cur)
@@ -1505,26 +3080,23 @@ def _get_current_user(request: Request) -> dict[str, Any] | None:
                 (sid_uuid,),
             )
             row = cur.fetchone()
-            if not row:
-                return None
-            user_id, username, display_name, role, is_disabled, expires_at = row
-            if bool(is_disabled):
-                return None
-            if expires_at and expires_at <= now:
-                return None
-
-            try:
-                cur.execute(_auth_schema('UPDATE "__SCHEMA__".sessions SET last_seen_at=now() WHERE id=%s;'), (sid_uuid,))
-                conn.commit()
-            except Exception:
-                conn.rollback()
+    if not row:
+        return None
+    user_id, username, display_name, role, is_disabled, expires_at = row
+    if bool(is_disabled):
+        return None
+    if expires_at and expires_at <= now:
+        return None
 
-            return {
-                "id": str(user_id),
-                "username": str(username),
-                "display_name": str(display_name or ""),
-                "role": str(role or "viewer"),
-            }
+    user = {
+        "id": str(user_id),
+        "username": str(username),
+        "display_name": str(display_name or ""),
+        "role": str(role or "viewer"),
+    }
+    _SESSION_CACHE.set(sid_uuid, {"user": user, "expires_at": expires_at})
+    _touch_session(sid_uuid)
+    return dict(user)
 
 
 def _require_access(
@@ -1741,6 +3313,7 @@ def _docs_folder_for(*, app_key: str, group_key: str) -> str:
     return f"{ak}/{gk}" if gk else ak
 
 
+@_schema_step("documents")
 def _ensure_documents_tables(cur: psycopg.Cursor) -> None:
     """
     Store uploaded documents in Postgres (bytea) + metadata in ops schema.
@@ -1872,11 +3445,13 @@ _DIRECTORY_SCHEMA_STATEMENTS: list[str] = [
 ]
 
 
+@_schema_step("directory")
 def _ensure_directory_tables(cur: psycopg.Cursor) -> None:
     for stmt in _DIRECTORY_SCHEMA_STATEMENTS:
         cur.execute(_directory_schema(stmt))
 
 
+@_schema_step("prompts")
 def _ensure_prompts_tables(cur: psycopg.Cursor) -> None:
     cur.execute("CREATE EXTENSION IF NOT EXISTS pgcrypto;")
     cur.execute(_prompts_schema('CREATE SCHEMA IF NOT EXISTS "__SCHEMA__";'))
@@ -2554,6 +4129,7 @@ def _fmt_ui_datetime(dt: Any) -> str:
     return f"{month} {day}, {year} {hour12}:{minute} {ampm}"
 
 
+@_schema_step("travel_segment_maps")
 def _ensure_travel_segment_maps_table(cur: psycopg.Cursor) -> None:
     schema = _jobs_schema_name()
     cur.execute(
@@ -2841,6 +4417,39 @@ def _mapbox_style_diagnostics(*, access_key: str, style_ref: str) -> dict[str, A
     return out
 
 
+def _record_location_asset(cur: psycopg.Cursor, *, location_id: Any, kind: str, year: int, blob: Blob) -> Any:
+    """
+    Point the location's latest `kind`/`year` asset at `blob`. An unchanged chart refreshes
+    `generated_at` on the existing row instead of inserting a duplicate.
+    """
+    cur.execute(
+        _schema(
+            """
+            UPDATE "__SCHEMA__".assets SET generated_at=now()
+            WHERE id = (
+              SELECT id FROM "__SCHEMA__".assets
+              WHERE location_id=%s AND kind=%s AND year=%s
+              ORDER BY generated_at DESC
+              LIMIT 1
+            ) AND s3_bucket=%s AND s3_key=%s
+            RETURNING id;
+            """
+        ),
+        (location_id, kind, year, blob.s3_bucket, blob.s3_key),
+    )
+    row = cur.fetchone()
+    if row:
+        return row[0]
+    cur.execute(
+        _schema(
+            'INSERT INTO "__SCHEMA__".assets (location_id, kind, year, s3_bucket, s3_key, bytes, content_type, generated_at) VALUES (%s,%s,%s,%s,%s,%s,%s,now()) RETURNING id;'
+        ),
+        (location_id, kind, year, blob.s3_bucket, blob.s3_key, blob.bytes, blob.content_type),
+    )
+    (asset_id,) = cur.fetchone()  # type: ignore[misc]
+    return asset_id
+
+
 def _generate_weather_png_for_slug(
     *, location_slug: str, year: int, title_override: str | None = None, subtitle_override: str | None = None
 ) -> dict[str, Any]:
@@ -2896,21 +4505,20 @@ def _generate_weather_png_for_slug(
     png_bytes = out_path.read_bytes()
 
     cfg = get_s3_config()
-    key = f"{cfg.prefix}{location_slug}/weather/{year}.png"
-    put_png(region=cfg.region, bucket=cfg.bucket, key=key, body=png_bytes)
-
-    generated_at = datetime.now(timezone.utc)
-
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                _schema(
-                    'INSERT INTO "__SCHEMA__".assets (location_id, kind, year, s3_bucket, s3_key, bytes, content_type, generated_at) VALUES (%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id;'
-                ),
-                (location_id, "weather", year, cfg.bucket, key, len(png_bytes), "image/png", generated_at),
+            blob = _store_artifact(
+                cur,
+                region=cfg.region,
+                bucket=cfg.bucket,
+                prefix=cfg.prefix,
+                body=png_bytes,
+                content_type="image/png",
+                name=f"{cfg.prefix}{location_slug}/weather/{year}.png",
             )
-            (asset_id,) = cur.fetchone()  # type: ignore[misc]
+            asset_id = _record_location_asset(cur, location_id=location_id, kind="weather", year=year, blob=blob)
         conn.commit()
+    key = blob.s3_key
 
     view_url = presign_get(region=cfg.region, bucket=cfg.bucket, key=key, expires_in=3600)
     return {
@@ -2988,21 +4596,20 @@ def _generate_daylight_png_for_slug(
     png_bytes = out_path.read_bytes()
 
     cfg = get_s3_config()
-    key = f"{cfg.prefix}{location_slug}/daylight/{year}.png"
-    put_png(region=cfg.region, bucket=cfg.bucket, key=key, body=png_bytes)
-
-    generated_at = datetime.now(timezone.utc)
-
     with _connect() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                _schema(
-                    'INSERT INTO "__SCHEMA__".assets (location_id, kind, year, s3_bucket, s3_key, bytes, content_type, generated_at) VALUES (%s,%s,%s,%s,%s,%s,%s,%s) RETURNING id;'
-                ),
-                (location_id, "daylight", year, cfg.bucket, key, len(png_bytes), "image/png", generated_at),
+            blob = _store_artifact(
+                cur,
+                region=cfg.region,
+                bucket=cfg.bucket,
+                prefix=cfg.prefix,
+                body=png_bytes,
+                content_type="image/png",
+                name=f"{cfg.prefix}{location_slug}/daylight/{year}.png",
             )
-            (asset_id,) = cur.fetchone()  # type: ignore[misc]
+            asset_id = _record_location_asset(cur, location_id=location_id, kind="daylight", year=year, blob=blob)
         conn.commit()
+    key = blob.s3_key
 
     view_url = presign_get(region=cfg.region, bucket=cfg.bucket, key=key, expires_in=3600)
     return {
@@ -3474,6 +5081,13 @@ def list_weather_locations(
             )
             rows = cur.fetchall()
 
+    # Sign the whole page in one pass (warm entries come from the presign cache).
+    objects: list[tuple[str, str]] = []
+    for row in rows:
+        weather_bucket, weather_key, daylight_bucket, daylight_key = row[-4:]
+        objects.append((str(weather_bucket or cfg.bucket), str(weather_key or "")))
+        objects.append((str(daylight_bucket or cfg.bucket), str(daylight_key or "")))
+    urls = presign_many(region=cfg.region, objects=objects, expires_in=3600)
     for (
         _location_id,
         location_slug,
@@ -3491,15 +5105,8 @@ def list_weather_locations(
         if city_s and country_s:
             label = f"{city_s}, {country_s}"
 
-        weather_url = ""
-        if weather_key:
-            weather_url = presign_get(region=cfg.region, bucket=str(weather_bucket or cfg.bucket), key=str(weather_key), expires_in=3600)
-
-        daylight_url = ""
-        if daylight_key:
-            daylight_url = presign_get(
-                region=cfg.region, bucket=str(daylight_bucket or cfg.bucket), key=str(daylight_key), expires_in=3600
-            )
+        weather_url = urls.get((str(weather_bucket or cfg.bucket), str(weather_key or "")), "")
+        daylight_url = urls.get((str(daylight_bucket or cfg.bucket), str(daylight_key or "")), "")
 
         rows_out.append(
             {
@@ -4429,6 +6036,7 @@ def travel_segments_generate_maps(
         conn.commit()
 
     for i, seg in enumerate(payload.segments[:50], start=1):
+        db.release_request_connection()  # Mapbox + S3 calls below; don't pin a pool slot between segments.
         mode = (seg.mode or "").strip().lower()
         trip_id = (seg.trip_id or "").strip() or "unassigned-trip"
         profile, is_fallback, fallback_reason = _mapbox_profile_for_mode(mode)
@@ -4468,19 +6076,24 @@ def travel_segments_generate_maps(
                 dest_lat=float(seg.destination_lat),
             )
             png_bytes = _overlay_scale_bar_on_png(png_bytes=png_bytes, distance_m=distance_m)
-            s3_key = (
-                f"{s3_cfg.prefix}travel-segments/"
-                f"{_slugify(trip_id)}/maps/"
-                f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
-                f"-{int(seg.segment_order or i):03d}-{_slugify(str(seg.segment_name or 'segment'))}.png"
-            )
-            put_png(region=s3_cfg.region, bucket=s3_cfg.bucket, key=s3_key, body=png_bytes)
-            view_url = presign_get(region=s3_cfg.region, bucket=s3_cfg.bucket, key=s3_key, expires_in=3600)
             data_url = "data:image/png;base64," + b64encode(png_bytes).decode("ascii")
             rec_id = str(uuid.uuid4())
             with _connect() as conn:
                 with conn.cursor() as cur:
                     _ensure_travel_segment_maps_table(cur)
+                    blob = _store_artifact(
+                        cur,
+                        region=s3_cfg.region,
+                        bucket=s3_cfg.bucket,
+                        prefix=s3_cfg.prefix,
+                        body=png_bytes,
+                        content_type="image/png",
+                        name=(
+                            f"{s3_cfg.prefix}travel-segments/{_slugify(trip_id)}/maps/"
+                            f"{int(seg.segment_order or i):03d}-{_slugify(str(seg.segment_name or 'segment'))}.png"
+                        ),
+                    )
+                    s3_key = blob.s3_key
                     cur.execute(
                         f"""
                         INSERT INTO "{_jobs_schema_name()}".travel_segment_maps
@@ -4506,6 +6119,7 @@ def travel_segments_generate_maps(
                         ),
                     )
                 conn.commit()
+            view_url = presign_get(region=s3_cfg.region, bucket=s3_cfg.bucket, key=s3_key, expires_in=3600)
             items_out.append(
                 {
                     "id": rec_id,
@@ -4585,10 +6199,13 @@ def travel_segments_list_maps(
                 )
             rows2 = cur.fetchall()
 
+    urls = presign_many(
+        region=cfg.region, objects=[(str(r[10] or cfg.bucket), str(r[11] or "")) for r in rows2], expires_in=3600
+    )
     for rid, trip, seg_order, seg_name, mode, source, profile, is_fb, note, dist_m, bucket, key, created_at in rows2:
         b = str(bucket or cfg.bucket)
         k = str(key or "")
-        view_url = presign_get(region=cfg.region, bucket=b, key=k, expires_in=3600) if k else ""
+        view_url = urls.get((b, k), "")
         out.append(
             {
                 "id": str(rid),
@@ -4732,20 +6349,75 @@ def jobs_ui(
           const payloadEl = document.getElementById('payload');
           const logEl = document.getElementById('log');
 
+          let lastSeq = 0;
+          let started = false;
+
+          function appendLines(lines, seq) {{
+            if (!lines || !lines.length) return;
+            logEl.textContent += lines.map((l) => l.line + '\\n').join('');
+            lastSeq = seq;
+          }}
+
+          function showJob(j) {{
+            statusEl.textContent = `Status: ${{j.status}} • Kind: ${{j.kind}} • Created: ${{j.created_at}}`;
+          }}
+
+          async function tailLog() {{
+            // Only fetch lines we haven't seen yet.
+            for (;;) {{
+              const res = await fetch(`/jobs/api/{jid}/log?after_seq=${{lastSeq}}`, {{ cache: 'no-store' }});
+              const body = await res.json().catch(() => ({{}}));
+              if (!res.ok || !body.ok) return;
+              appendLines(body.lines, body.last_seq);
+              if (!body.more) return;
+            }}
+          }}
+
+          // Polling fallback (no EventSource, or the stream failed).
           async function tick() {{
-            const res = await fetch('/jobs/api/{jid}', {{ cache: 'no-store' }});
+            const res = await fetch('/jobs/api/{jid}?include_log=false', {{ cache: 'no-store' }});
             const body = await res.json().catch(() => ({{}}));
             if (!res.ok || !body.ok) {{
               statusEl.textContent = body.detail || body.error || `HTTP ${{res.status}}`;
-              return;
+              return null;
             }}
             const j = body.job || {{}};
-            statusEl.textContent = `Status: ${{j.status}} • Kind: ${{j.kind}} • Created: ${{j.created_at}}`;
+            showJob(j);
             payloadEl.textContent = JSON.stringify(j.payload || {{}}, null, 2);
-            logEl.textContent = String(j.log || '');
-            if (j.status === 'queued' || j.status === 'running') setTimeout(tick, 1200);
+            if (!started) {{
+              // Older jobs kept their log in the job row; new lines are tailed below.
+              logEl.textContent = String(j.log || '');
+              started = true;
+            }}
+            await tailLog();
+            return j;
+          }}
+
+          async function poll() {{
+            const j = await tick();
+            if (j && ['queued', 'running', 'waiting'].includes(j.status)) setTimeout(poll, 1200);
+          }}
+
+          function stream() {{
+            const es = new EventSource(`/jobs/api/{jid}/events?after_seq=${{lastSeq}}`);
+            es.addEventListener('log', (e) => {{
+              const b = JSON.parse(e.data || '{{}}');
+              appendLines(b.lines, b.last_seq);
+            }});
+            es.addEventListener('status', (e) => showJob(JSON.parse(e.data || '{{}}')));
+            es.addEventListener('result', () => es.close());
+            es.onerror = () => {{
+              es.close();
+              poll();
+            }};
           }}
-          tick();
+
+          (async () => {{
+            const j = await tick();
+            if (!j || !['queued', 'running', 'waiting'].includes(j.status)) return;
+            if (window.EventSource) stream();
+            else setTimeout(poll, 1200);
+          }})();
         </script>
         """.strip()
 
@@ -4784,19 +6456,149 @@ def jobs_ui(
 def jobs_api_item(
     job_id: str,
     request: Request,
+    include_log: bool = Query(default=True),
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> dict[str, Any]:
     _require_access(request=request, x_api_key=x_api_key, role="viewer")
-    job = _get_job(job_id)
+    job = _get_job(job_id, include_log=include_log)
     if not job:
         raise HTTPException(status_code=404, detail="Unknown job")
     return {"ok": True, "job": job}
 
 
+@app.get("/jobs/api/{job_id}/log")
+def jobs_api_log(
+    job_id: str,
+    request: Request,
+    after_seq: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, ge=1, le=5000),
+    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+) -> dict[str, Any]:
+    """
+    Incremental log tail: lines with seq > after_seq. Poll again with the returned `last_seq`.
+    """
+    _require_access(request=request, x_api_key=x_api_key, role="viewer")
+    out = _get_job_log(job_id, after_seq=after_seq, limit=limit)
+    if out is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return {"ok": True, **out}
+
+
+# SSE subscribers: job_id -> {(loop, event)}; set from the NOTIFY listener thread.
+_JOB_EVENT_SUBS: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+_JOB_EVENT_SUBS_LOCK = threading.Lock()
+_JOB_EVENTS_LISTENING = False
+_JOB_EVENTS_TERMINAL = {"ok", "error", "cancelled"}
+
+
+def _on_job_event(payload: str | None) -> None:
+    with _JOB_EVENT_SUBS_LOCK:
+        if payload is None:
+            # Listener reconnected; events may have been missed, so every stream re-checks.
+            targets = [sub for subs in _JOB_EVENT_SUBS.values() for sub in subs]
+        else:
+            targets = list(_JOB_EVENT_SUBS.get(payload) or ())
+    for loop, ev in targets:
+        try:
+            loop.call_soon_threadsafe(ev.set)
+        except RuntimeError:
+            pass  # loop closed
+
+
+def _ensure_job_events_listener() -> None:
+    global _JOB_EVENTS_LISTENING
+    with _JOB_EVENT_SUBS_LOCK:
+        if _JOB_EVENTS_LISTENING:
+            return
+        _JOB_EVENTS_LISTENING = True
+    db.listen(_get_database_url(), _JOB_EVENTS_CHANNEL, _on_job_event)
+
+
+def _sse(event: str, data: dict[str, Any], *, event_id: int | None = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _job_event_stream(request: Request, *, job_id: str, after_seq: int) -> Any:
+    loop = asyncio.get_running_loop()
+    ev = asyncio.Event()
+    sub = (loop, ev)
+    with _JOB_EVENT_SUBS_LOCK:
+        _JOB_EVENT_SUBS.setdefault(job_id, set()).add(sub)
+    try:
+        last_status = ""
+        seq = after_seq
+        while True:
+            ev.clear()
+            tail = await db.run_blocking(_get_job_log, job_id, after_seq=seq)
+            if tail is None:
+                yield _sse("error", {"detail": "Unknown job"})
+                return
+            if tail["lines"]:
+                seq = tail["last_seq"]
+                yield _sse("log", {"lines": tail["lines"], "last_seq": seq}, event_id=seq)
+            if tail["more"]:
+                continue
+            status = str(tail["status"] or "")
+            if status != last_status:
+                last_status = status
+                job = await db.run_blocking(_get_job, job_id, include_log=False) or {}
+                summary = {k: job.get(k) for k in ("id", "kind", "status", "created_at", "started_at", "finished_at")}
+                yield _sse("status", summary)
+                if status in _JOB_EVENTS_TERMINAL:
+                    yield _sse("result", {"status": status, "result": job.get("result"), "error": job.get("error")})
+                    return
+            try:
+                await asyncio.wait_for(ev.wait(), timeout=15.0)
+            except asyncio.TimeoutError:
+                # Keep proxies from closing the idle stream; also a slow re-check if a NOTIFY was missed.
+                yield ": keepalive\n\n"
+            if await request.is_disconnected():
+                return
+    finally:
+        with _JOB_EVENT_SUBS_LOCK:
+            subs = _JOB_EVENT_SUBS.get(job_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    _JOB_EVENT_SUBS.pop(job_id, None)
+
+
+@app.get("/jobs/api/{job_id}/events")
+async def jobs_api_events(
+    job_id: str,
+    request: Request,
+    after_seq: int = Query(default=0, ge=0),
+    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+) -> StreamingResponse:
+    """
+    Server-Sent Events for one job: `log` (new lines), `status` (on change) and a final `result`.
+    Driven by NOTIFY on `eti360_job_events`; no DB work between events.
+    """
+    await db.run_blocking(_require_access, request=request, x_api_key=x_api_key, role="viewer")
+    job = await db.run_blocking(_get_job, job_id, include_log=False)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    # The stream can stay open for minutes: give the request's connection back and stop lending.
+    await db.run_blocking(db.release_request_connection, done=True)
+    # EventSource reconnects send the last log seq they saw.
+    last_event_id = str(request.headers.get("last-event-id") or "").strip()
+    if last_event_id.isdigit():
+        after_seq = max(after_seq, int(last_event_id))
+    _ensure_job_events_listener()
+    return StreamingResponse(
+        _job_event_stream(request, job_id=str(job["id"]), after_seq=after_seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
 class ArpRunIn(BaseModel):
     activity_ids: list[int] = Field(default_factory=list)
     top_k: int = 12
     auto_generate: bool = False
+    # Re-check already fetched sources with conditional GETs (ETag/Last-Modified).
+    refresh_sources: bool = False
 
 
 class ArpCreateIn(BaseModel):
@@ -5941,6 +7743,10 @@ def _truncate_words(s: str, max_words: int) -> str:
 
 
 def _has_column(cur: psycopg.Cursor, *, schema: str, table: str, column: str) -> bool:
+    # Columns are only ever added, so positive answers are cached for the process lifetime.
+    cache_key = (schema, table, column)
+    if cache_key in _COLUMN_CACHE:
+        return True
     cur.execute(
         """
         SELECT 1
@@ -5950,7 +7756,10 @@ def _has_column(cur: psycopg.Cursor, *, schema: str, table: str, column: str) ->
         """.strip(),
         (schema, table, column),
     )
-    return cur.fetchone() is not None
+    found = cur.fetchone() is not None
+    if found:
+        _COLUMN_CACHE.add(cache_key)
+    return found
 
 
 @app.get("/arp/api/schools")
@@ -6885,6 +8694,29 @@ def arp_import_from_repo(
     }
 
 
+@app.get("/arp/api/search")
+def arp_api_search(
+    request: Request,
+    q: str = Query(default=""),
+    activity_id: int = Query(default=0, ge=0),
+    top_k: int = Query(default=20, ge=1, le=100),
+    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+) -> dict[str, Any]:
+    """
+    Full-text search over prepared ARP evidence; `activity_id=0` searches every activity.
+    """
+    _require_access(request=request, x_api_key=x_api_key, role="viewer")
+    query = (q or "").strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Missing q")
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _ensure_arp_tables(cur)
+            results = _arp_search_chunks(cur, query=query, activity_id=activity_id or None, top_k=top_k)
+        conn.commit()
+    return {"ok": True, "query": query, "results": results}
+
+
 @app.get("/arp/api/activities")
 def arp_api_activities(request: Request) -> dict[str, Any]:
     _ = request
@@ -7084,14 +8916,20 @@ def arp_prepare(
     request: Request,
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> dict[str, Any]:
-    _require_write_access(request=request, x_api_key=x_api_key, role="editor")
+    user = _require_write_access(request=request, x_api_key=x_api_key, role="editor")
     ids = [int(x) for x in (body.activity_ids or []) if int(x) > 0]
     if not ids:
         raise HTTPException(status_code=400, detail="Select at least one activity")
     top_k = max(1, min(int(body.top_k or 12), 50))
     job_id = _enqueue_job(
         kind="arp_prepare",
-        payload={"activity_ids": ids, "top_k": top_k, "auto_generate": bool(body.auto_generate)},
+        payload={
+            "activity_ids": ids,
+            "top_k": top_k,
+            "auto_generate": bool(body.auto_generate),
+            "refresh_sources": bool(body.refresh_sources),
+        },
+        created_by=str(user.get("username") or ""),
     )
     return {"ok": True, "job_id": job_id}
 
@@ -7102,12 +8940,16 @@ def arp_generate(
     request: Request,
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> dict[str, Any]:
-    _require_write_access(request=request, x_api_key=x_api_key, role="editor")
+    user = _require_write_access(request=request, x_api_key=x_api_key, role="editor")
     ids = [int(x) for x in (body.activity_ids or []) if int(x) > 0]
     if not ids:
         raise HTTPException(status_code=400, detail="Select at least one activity")
     top_k = max(1, min(int(body.top_k or 12), 50))
-    job_id = _enqueue_job(kind="arp_prepare_generate", payload={"activity_ids": ids, "top_k": top_k})
+    job_id = _enqueue_job(
+        kind="arp_prepare_generate",
+        payload={"activity_ids": ids, "top_k": top_k},
+        created_by=str(user.get("username") or ""),
+    )
     return {"ok": True, "job_id": job_id}
 
 
@@ -7412,34 +9254,11 @@ def trip_providers_countries_index_ui(
         where_sql = "AND (pc.country_or_territory ILIKE %s OR pc.country_or_territory = %s)"
         params.extend([f"%{q_raw}%", q_alias or q_raw])
 
+    # One query feeds both the per-country counts and the per-continent unique-provider totals
+    # (continent headers count unique providers, not the sum across countries).
     sql = _directory_schema(
         f"""
-        SELECT
-          pc.country_or_territory,
-          COUNT(DISTINCT pc.provider_key) AS provider_count
-        FROM "__SCHEMA__".provider_country pc
-        JOIN "__SCHEMA__".providers p ON p.provider_key = pc.provider_key
-        LEFT JOIN "__SCHEMA__".provider_classifications c ON c.provider_id = p.id
-        WHERE p.status='active'
-          AND NULLIF(TRIM(p.website_url), '') IS NOT NULL
-          AND c.market_orientation = %s
-          {where_sql}
-        GROUP BY pc.country_or_territory
-        ORDER BY pc.country_or_territory ASC;
-        """
-    ).strip()
-
-    rows: list[tuple[Any, ...]] = []
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            _ensure_directory_tables(cur)
-            cur.execute(sql, params)
-            rows = list(cur.fetchall())
-
-    # For continent headers, count unique providers per continent (not sum across countries).
-    sql_provider_keys = _directory_schema(
-        f"""
-        SELECT
+        SELECT DISTINCT
           pc.country_or_territory,
           pc.provider_key
         FROM "__SCHEMA__".provider_country pc
@@ -7449,7 +9268,7 @@ def trip_providers_countries_index_ui(
           AND NULLIF(TRIM(p.website_url), '') IS NOT NULL
           AND c.market_orientation = %s
           {where_sql}
-        ;
+        ORDER BY pc.country_or_territory ASC;
         """
     ).strip()
 
@@ -7457,17 +9276,22 @@ def trip_providers_countries_index_ui(
     with _connect() as conn:
         with conn.cursor() as cur:
             _ensure_directory_tables(cur)
-            cur.execute(sql_provider_keys, params)
+            cur.execute(sql, params)
             provider_rows = list(cur.fetchall())
 
     continent_to_provider_keys: dict[str, set[str]] = {}
+    country_to_provider_keys: dict[str, set[str]] = {}
     for country, provider_key in provider_rows:
         c = str(country or "").strip()
         pk = str(provider_key or "").strip()
-        if not (c and pk):
+        if not pk:
+            continue
+        country_to_provider_keys.setdefault(str(country or ""), set()).add(pk)
+        if not c:
             continue
         continent = continent_for_country(c)
         continent_to_provider_keys.setdefault(continent, set()).add(pk)
+    rows = [(country, len(keys)) for country, keys in country_to_provider_keys.items()]
 
     continent_to_countries: dict[str, list[tuple[str, int]]] = {}
     total_countries = 0
@@ -8183,26 +10007,7 @@ def trip_providers_review_not_stated_ui(
     return _ui_shell(title="Review Trip Providers", active="trip_providers", body_html=body_html, max_width_px=1400, user=user)
 
 
-@app.post("/trip_providers/review_not_stated/apply")
-async def trip_providers_review_not_stated_apply(
-    request: Request,
-    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
-) -> Response:
-    _require_access(request=request, x_api_key=x_api_key, role="admin")
-
-    form = await request.form()
-    # Extract actions of the form action__{provider_key} => decision
-    actions: dict[str, str] = {}
-    for k, v in form.items():
-        ks = str(k)
-        vs = str(v or "").strip()
-        if ks.startswith("action__"):
-            provider_key = ks.split("__", 1)[1]
-            actions[provider_key] = vs
-
-    if not actions:
-        return RedirectResponse(url="/trip_providers/review_not_stated?done=1", status_code=303)
-
+def _trip_providers_apply_review_actions(actions: dict[str, str]) -> None:
     # Apply changes in a single transaction.
     with _connect() as conn:
         with conn.cursor() as cur:
@@ -8261,6 +10066,29 @@ async def trip_providers_review_not_stated_apply(
                     continue
         conn.commit()
 
+
+@app.post("/trip_providers/review_not_stated/apply")
+async def trip_providers_review_not_stated_apply(
+    request: Request,
+    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+) -> Response:
+    await db.run_blocking(_require_access, request=request, x_api_key=x_api_key, role="admin")
+
+    form = await request.form()
+    # Extract actions of the form action__{provider_key} => decision
+    actions: dict[str, str] = {}
+    for k, v in form.items():
+        ks = str(k)
+        vs = str(v or "").strip()
+        if ks.startswith("action__"):
+            provider_key = ks.split("__", 1)[1]
+            actions[provider_key] = vs
+
+    if not actions:
+        return RedirectResponse(url="/trip_providers/review_not_stated?done=1", status_code=303)
+
+    await db.run_blocking(_trip_providers_apply_review_actions, actions)
+
     return RedirectResponse(url="/trip_providers/review_not_stated?done=1", status_code=303)
 
 
@@ -8625,6 +10453,32 @@ def _safe_next_path(next_path: str) -> str:
     return p
 
 
+def _trip_provider_set_status(*, provider_key: str, status: str) -> None:
+    sql = _directory_schema(
+        """
+        UPDATE "__SCHEMA__".providers
+        SET status=%s, updated_at=now()
+        WHERE provider_key=%s;
+        """
+    ).strip()
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _ensure_directory_tables(cur)
+            cur.execute(sql, (status, provider_key))
+        conn.commit()
+
+
+def _trip_provider_delete(*, provider_key: str) -> None:
+    sql_del_country = _directory_schema('DELETE FROM "__SCHEMA__".provider_country WHERE provider_key=%s;').strip()
+    sql_del_provider = _directory_schema('DELETE FROM "__SCHEMA__".providers WHERE provider_key=%s;').strip()
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _ensure_directory_tables(cur)
+            cur.execute(sql_del_country, (provider_key,))
+            cur.execute(sql_del_provider, (provider_key,))
+        conn.commit()
+
+
 @app.post("/trip_providers_research/{provider_key}/set_status")
 async def trip_providers_set_status(
     provider_key: str,
@@ -8633,24 +10487,13 @@ async def trip_providers_set_status(
     next_path: str = Form(default="/trip_providers_research"),
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> Response:
-    _require_access(request=request, x_api_key=x_api_key, role="editor")
+    await db.run_blocking(_require_access, request=request, x_api_key=x_api_key, role="editor")
     provider_key = _safe_provider_key(provider_key)
     status_s = (status or "").strip().lower()
     if status_s not in {"active", "excluded"}:
         raise HTTPException(status_code=400, detail="Invalid status")
 
-    sql = _directory_schema(
-        """
-        UPDATE "__SCHEMA__".providers
-        SET status=%s, updated_at=now()
-        WHERE provider_key=%s;
-        """
-    ).strip()
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            _ensure_directory_tables(cur)
-            cur.execute(sql, (status_s, provider_key))
-        conn.commit()
+    await db.run_blocking(_trip_provider_set_status, provider_key=provider_key, status=status_s)
 
     return RedirectResponse(url=_safe_next_path(next_path), status_code=303)
 
@@ -8662,17 +10505,10 @@ async def trip_providers_delete(
     next_path: str = Form(default="/trip_providers_research"),
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> Response:
-    _require_access(request=request, x_api_key=x_api_key, role="admin")
+    await db.run_blocking(_require_access, request=request, x_api_key=x_api_key, role="admin")
     provider_key = _safe_provider_key(provider_key)
 
-    sql_del_country = _directory_schema('DELETE FROM "__SCHEMA__".provider_country WHERE provider_key=%s;').strip()
-    sql_del_provider = _directory_schema('DELETE FROM "__SCHEMA__".providers WHERE provider_key=%s;').strip()
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            _ensure_directory_tables(cur)
-            cur.execute(sql_del_country, (provider_key,))
-            cur.execute(sql_del_provider, (provider_key,))
-        conn.commit()
+    await db.run_blocking(_trip_provider_delete, provider_key=provider_key)
 
     return RedirectResponse(url=_safe_next_path(next_path), status_code=303)
 
@@ -8735,6 +10571,7 @@ def build_icon_generation_prompt(
     }
 
 
+@_schema_step("icons_gallery")
 def _ensure_icons_gallery_table(cur: psycopg.Cursor[Any]) -> None:
     cur.execute(_schema("CREATE EXTENSION IF NOT EXISTS pgcrypto;"))
     cur.execute(
@@ -8896,6 +10733,7 @@ def render_icon(
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> dict[str, Any]:
     _require_access(request=request, x_api_key=x_api_key, role="viewer")
+    db.release_request_connection()
     form = IconFormInput(activity_name=body.activity_name, context_note=body.context_note)
     classification = classify_icon_intent(form)
     spec = classification.spec.canonical()
@@ -8946,6 +10784,7 @@ def render_icon_batch(
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> dict[str, Any]:
     _require_access(request=request, x_api_key=x_api_key, role="viewer")
+    db.release_request_connection()
 
     rows: list[dict[str, Any]] = []
     success_count = 0
@@ -9694,6 +11533,22 @@ def health_db() -> JSONResponse:
     )
 
 
+@app.get("/health/db/pool")
+def health_db_pool() -> JSONResponse:
+    """
+    Connection pool diagnostics (safe to share): in-use, waiting, acquire wait-time histogram.
+    """
+    return JSONResponse({"ok": True, **db.pool_stats()}, headers={"Cache-Control": "no-store"})
+
+
+@app.get("/health/s3")
+def health_s3() -> JSONResponse:
+    """
+    S3 client diagnostics: cached regions, pool/retry settings, per-operation calls/bytes/latency.
+    """
+    return JSONResponse({"ok": True, **s3_stats()}, headers={"Cache-Control": "no-store"})
+
+
 @app.get("/health/version")
 def health_version() -> JSONResponse:
     """
@@ -9769,6 +11624,45 @@ def login_page(request: Request) -> str:
     return _ui_shell(title="Login", active="apps", body_html=body_html, max_width_px=820, user=None)
 
 
+def _login_lookup_user(*, username: str) -> tuple[Any, str]:
+    """
+    Returns (user_id, password_hash). Raises 401/403 for unknown or disabled users.
+    """
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _ensure_auth_tables(cur)
+            cur.execute(_auth_schema('SELECT id, password_hash, is_disabled FROM "__SCHEMA__".users WHERE username=%s LIMIT 1;'), (username,))
+            row = cur.fetchone()
+    if not row:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    user_id, password_hash, is_disabled = row
+    if bool(is_disabled):
+        raise HTTPException(status_code=403, detail="User is disabled")
+    return user_id, str(password_hash or "")
+
+
+def _login_create_session(
+    *, user_id: Any, old_hash: str, new_hash: str, expires_at: datetime, user_agent: str, ip: str
+) -> str:
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            if new_hash:
+                # Compare-and-swap so a concurrent password change isn't overwritten.
+                cur.execute(
+                    _auth_schema('UPDATE "__SCHEMA__".users SET password_hash=%s, updated_at=now() WHERE id=%s AND password_hash=%s;'),
+                    (new_hash, user_id, old_hash),
+                )
+            cur.execute(
+                _auth_schema(
+                    'INSERT INTO "__SCHEMA__".sessions (user_id, expires_at, user_agent, ip) VALUES (%s,%s,%s,%s) RETURNING id;'
+                ),
+                (user_id, expires_at, user_agent, ip),
+            )
+            (sid,) = cur.fetchone()  # type: ignore[misc]
+        conn.commit()
+    return str(sid)
+
+
 @app.post("/login")
 async def login_submit(request: Request) -> Response:
     if _auth_disabled():
@@ -9796,32 +11690,24 @@ async def login_submit(request: Request) -> Response:
     ttl = _session_ttl_seconds()
     expires_at = now + timedelta(seconds=ttl)
 
-    with _connect() as conn:
-        with conn.cursor() as cur:
-            _ensure_auth_tables(cur)
-            cur.execute(_auth_schema('SELECT id, password_hash, is_disabled FROM "__SCHEMA__".users WHERE username=%s LIMIT 1;'), (username,))
-            row = cur.fetchone()
-            if not row:
-                raise HTTPException(status_code=401, detail="Invalid username or password")
-            user_id, password_hash, is_disabled = row
-            if bool(is_disabled):
-                raise HTTPException(status_code=403, detail="User is disabled")
-            if not _verify_password(password, str(password_hash or "")):
-                raise HTTPException(status_code=401, detail="Invalid username or password")
-
-            cur.execute(
-                _auth_schema(
-                    'INSERT INTO "__SCHEMA__".sessions (user_id, expires_at, user_agent, ip) VALUES (%s,%s,%s,%s) RETURNING id;'
-                ),
-                (
-                    user_id,
-                    expires_at,
-                    str(request.headers.get("user-agent") or "")[:512],
-                    str(request.client.host if request.client else "")[:128],
-                ),
-            )
-            (sid,) = cur.fetchone()  # type: ignore[misc]
-        conn.commit()
+    limiter_key = _LOGIN_LIMITER.acquire(username)
+    try:
+        user_id, password_hash = await db.run_blocking(_login_lookup_user, username=username)
+        if not await _verify_password_async(password, password_hash):
+            raise HTTPException(status_code=401, detail="Invalid username or password")
+        new_hash = await _rehash_password_async(password) if _password_needs_rehash(password_hash) else ""
+    finally:
+        _LOGIN_LIMITER.release(limiter_key)
+
+    sid = await db.run_blocking(
+        _login_create_session,
+        user_id=user_id,
+        old_hash=password_hash,
+        new_hash=new_hash,
+        expires_at=expires_at,
+        user_agent=str(request.headers.get("user-agent") or "")[:512],
+        ip=str(request.client.host if request.client else "")[:128],
+    )
 
     is_https = (request.headers.get("x-forwarded-proto") or "").lower() == "https" or request.url.scheme == "https"
     resp = Response(status_code=303, headers={"Location": "/apps"})
@@ -9851,6 +11737,7 @@ def logout(request: Request) -> Response:
                 with conn.cursor() as cur:
                     _ensure_auth_tables(cur)
                     cur.execute(_auth_schema('DELETE FROM "__SCHEMA__".sessions WHERE id=%s;'), (sid_uuid,))
+                    _invalidate_auth_cache(session_id=str(sid_uuid), cur=cur)
                 conn.commit()
         except Exception:
             pass
@@ -9918,7 +11805,7 @@ def admin_users_create(
     if role not in _ROLE_RANK:
         raise HTTPException(status_code=400, detail="Invalid role (viewer/editor/admin)")
 
-    password_hash = _hash_password(body.password)
+    password_hash = _password_executor().submit(_hash_password, body.password).result()
 
     with _connect() as conn:
         with conn.cursor() as cur:
@@ -9930,6 +11817,7 @@ def admin_users_create(
                 (username, (body.email or "").strip().lower(), (body.display_name or "").strip(), role, password_hash),
             )
             (user_id,) = cur.fetchone()  # type: ignore[misc]
+            _invalidate_auth_cache(user_id=str(user_id), cur=cur)
         conn.commit()
 
     return {"ok": True, "user_id": str(user_id), "username": username, "role": role}
@@ -11235,7 +13123,8 @@ def documents_download(
 
     if storage_s == "s3" or (bucket and key):
         cfg = get_s3_config()
-        view_url = presign_get(region=cfg.region, bucket=bucket or cfg.bucket, key=key, expires_in=3600)
+        # Blobs are content-addressed, so ask S3 to serve them under the document's filename.
+        view_url = presign_get(region=cfg.region, bucket=bucket or cfg.bucket, key=key, expires_in=3600, filename=fn)
         return RedirectResponse(url=view_url, status_code=302)
 
     body = bytes(content or b"")
@@ -11455,57 +13344,20 @@ def documents_preview(
     )
 
 
-@app.post("/documents/upload")
-async def documents_upload(
-    request: Request,
-    file: UploadFile = File(...),
-    app_key: str = Form(default="planning"),
-    group_key: str = Form(default=""),
-    status: str = Form(default="future"),
-    notes: str = Form(default=""),
-    overwrite: str = Form(default="true"),
-    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
-) -> Response:
-    actor = _require_access(request=request, x_api_key=x_api_key, role="editor") or {}
-    app_key_s = _require_docs_app_key(app_key)
-    group_key_s = _normalize_group_key(group_key)
-    folder_s = _docs_folder_for(app_key=app_key_s, group_key=group_key_s)
-    status_s = _require_docs_status(status)
-    notes_s = (notes or "").strip()
-    overwrite_b = (overwrite or "").strip().lower() not in {"0", "false", "no", "off"}
-
-    if not file or not file.filename:
-        raise HTTPException(status_code=400, detail="file is required")
-    filename = str(file.filename).strip()
-    if len(filename) > 255:
-        raise HTTPException(status_code=400, detail="filename too long")
-
-    data = await file.read()
-    if not data:
-        raise HTTPException(status_code=400, detail="empty file")
-    if len(data) > _docs_max_upload_bytes():
-        raise HTTPException(status_code=413, detail="file too large")
-
-    digest = sha256(data).hexdigest()
-    content_type = (file.content_type or "").strip() or "application/octet-stream"
-    safe_key_name = _safe_s3_filename(filename)
-
-    username = str(actor.get("username") or "")
-    user_id_uuid = None
-    try:
-        if str(actor.get("id") or "").strip() and str(actor.get("id")) not in {"disabled", "api_key", "startup"}:
-            user_id_uuid = uuid.UUID(str(actor.get("id")))
-    except Exception:
-        user_id_uuid = None
-
-    try:
-        s3_cfg = get_s3_config()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"S3 not configured for documents: {e}")
-
+def _documents_lookup_for_upload(
+    *, folder: str, filename: str, overwrite: bool, s3_bucket: str, digest: str, content_type: str
+) -> tuple[uuid.UUID, bool, str]:
+    """
+    Returns (doc_id, exists, blob_key). `blob_key` is non-empty when identical bytes are
+    already stored with the same content type. Raises 409 when the document exists and overwrite is off.
+    """
     with _connect() as conn:
         with conn.cursor() as cur:
             _ensure_documents_tables(cur)
+            _apply_ops_migrations(cur)
+            stored_key = lookup_blob(
+                cur, schema=_jobs_schema_name(), bucket=s3_bucket, digest=digest, content_type=content_type
+            )
             cur.execute(
                 _docs_schema(
                     """
@@ -11515,21 +13367,49 @@ async def documents_upload(
                     LIMIT 1;
                     """
                 ),
-                (folder_s, filename),
+                (folder, filename),
             )
             existing = cur.fetchone()
-            if existing and not overwrite_b:
-                raise HTTPException(status_code=409, detail="Document already exists (set overwrite=true)")
-
-            if existing:
-                (doc_id,) = existing
-            else:
-                doc_id = uuid.uuid4()
+    if existing and not overwrite:
+        raise HTTPException(status_code=409, detail="Document already exists (set overwrite=true)")
+    if existing:
+        return existing[0], True, stored_key
+    return uuid.uuid4(), False, stored_key
 
-            s3_key = f"{s3_cfg.prefix}{_docs_s3_prefix()}{folder_s}/{doc_id}/{safe_key_name}"
-            put_bytes(region=s3_cfg.region, bucket=s3_cfg.bucket, key=s3_key, body=data, content_type=content_type)
 
-            if existing:
+def _documents_save_upload_row(
+    *,
+    doc_id: uuid.UUID,
+    exists: bool,
+    folder: str,
+    app_key: str,
+    group_key: str,
+    filename: str,
+    content_type: str,
+    size: int,
+    digest: str,
+    status: str,
+    notes: str,
+    s3_bucket: str,
+    s3_key: str,
+    user_id: uuid.UUID | None,
+    username: str,
+    ref_name: str,
+) -> None:
+    with _connect() as conn:
+        with conn.cursor() as cur:
+            _ensure_documents_tables(cur)
+            register_blob(
+                cur,
+                schema=_jobs_schema_name(),
+                bucket=s3_bucket,
+                key=s3_key,
+                digest=digest,
+                size=size,
+                content_type=content_type,
+                name=ref_name,
+            )
+            if exists:
                 cur.execute(
                     _docs_schema(
                         """
@@ -11542,17 +13422,17 @@ async def documents_upload(
                         """
                     ),
                     (
-                        folder_s,
-                        app_key_s,
-                        group_key_s,
+                        folder,
+                        app_key,
+                        group_key,
                         content_type,
-                        len(data),
+                        size,
                         digest,
-                        status_s,
-                        notes_s,
-                        s3_cfg.bucket,
+                        status,
+                        notes,
+                        s3_bucket,
                         s3_key,
-                        user_id_uuid,
+                        user_id,
                         username,
                         b"",
                         doc_id,
@@ -11570,24 +13450,214 @@ async def documents_upload(
                     ),
                     (
                         doc_id,
-                        folder_s,
-                        app_key_s,
-                        group_key_s,
+                        folder,
+                        app_key,
+                        group_key,
                         filename,
                         content_type,
-                        len(data),
+                        size,
                         digest,
-                        status_s,
-                        notes_s,
-                        s3_cfg.bucket,
+                        status,
+                        notes,
+                        s3_bucket,
                         s3_key,
-                        user_id_uuid,
+                        user_id,
                         username,
                         b"",
                     ),
                 )
         conn.commit()
 
+
+def _docs_upload_part_bytes() -> int:
+    return max(MULTIPART_MIN_PART_BYTES, _env_int("DOCS_UPLOAD_PART_MB", 8) * 1024 * 1024)
+
+
+def _docs_upload_concurrency() -> int:
+    return max(1, min(_env_int("DOCS_UPLOAD_CONCURRENCY", 3), 16))
+
+
+async def _documents_stream_upload(
+    file: UploadFile, *, s3_cfg: Any, content_type: str, max_bytes: int
+) -> tuple[str, int, bytes, str]:
+    """
+    Read `file` in chunks, hashing as it goes and enforcing `max_bytes` as bytes arrive.
+
+    Returns (sha256, size, body, staging_key). Bodies that fit in one part come back in `body`
+    (staging_key=""); larger ones are streamed to a staging key via multipart upload with at most
+    DOCS_UPLOAD_CONCURRENCY parts in flight, so memory stays ~ part size x concurrency.
+    """
+    part_bytes = _docs_upload_part_bytes()
+    h = sha256()
+    size = 0
+    buf = bytearray()
+    mpu: MultipartUpload | None = None
+    sem = asyncio.Semaphore(_docs_upload_concurrency())
+    tasks: list[asyncio.Task[None]] = []
+
+    async def _send(part_number: int, body: bytes) -> None:
+        try:
+            await asyncio.to_thread(mpu.upload_part, part_number, body)  # type: ignore[union-attr]
+        finally:
+            sem.release()
+
+    async def _flush(body: bytes) -> None:
+        nonlocal mpu
+        if mpu is None:
+            mpu = MultipartUpload(
+                region=s3_cfg.region,
+                bucket=s3_cfg.bucket,
+                key=f"{s3_cfg.prefix}{_docs_s3_prefix()}_staging/{uuid.uuid4()}",
+                content_type=content_type,
+            )
+            await asyncio.to_thread(mpu.start)
+        await sem.acquire()
+        tasks.append(asyncio.create_task(_send(len(tasks) + 1, body)))
+
+    try:
+        while True:
+            chunk = await file.read(1024 * 1024)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail="file too large")
+            h.update(chunk)
+            buf += chunk
+            # Keep the tail in `buf` until EOF so the final part is never undersized.
+            while len(buf) >= 2 * part_bytes:
+                await _flush(bytes(buf[:part_bytes]))
+                del buf[:part_bytes]
+        if mpu is None and len(buf) <= part_bytes:
+            return h.hexdigest(), size, bytes(buf), ""
+        while buf:
+            # Tail is < 2 parts: send one full part (if it leaves >= min part) then the rest.
+            n = part_bytes if len(buf) - part_bytes >= MULTIPART_MIN_PART_BYTES else len(buf)
+            await _flush(bytes(buf[:n]))
+            del buf[:n]
+        await asyncio.gather(*tasks)
+        await asyncio.to_thread(mpu.complete)  # type: ignore[union-attr]
+        return h.hexdigest(), size, b"", mpu.key  # type: ignore[union-attr]
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if mpu is not None:
+            try:
+                await asyncio.to_thread(mpu.abort)
+            except Exception:
+                pass
+        raise
+
+
+@app.post("/documents/upload")
+async def documents_upload(
+    request: Request,
+    file: UploadFile = File(...),
+    app_key: str = Form(default="planning"),
+    group_key: str = Form(default=""),
+    status: str = Form(default="future"),
+    notes: str = Form(default=""),
+    overwrite: str = Form(default="true"),
+    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+) -> Response:
+    actor = await db.run_blocking(_require_access, request=request, x_api_key=x_api_key, role="editor") or {}
+    app_key_s = _require_docs_app_key(app_key)
+    group_key_s = _normalize_group_key(group_key)
+    folder_s = _docs_folder_for(app_key=app_key_s, group_key=group_key_s)
+    status_s = _require_docs_status(status)
+    notes_s = (notes or "").strip()
+    overwrite_b = (overwrite or "").strip().lower() not in {"0", "false", "no", "off"}
+
+    if not file or not file.filename:
+        raise HTTPException(status_code=400, detail="file is required")
+    filename = str(file.filename).strip()
+    if len(filename) > 255:
+        raise HTTPException(status_code=400, detail="filename too long")
+
+    content_type = (file.content_type or "").strip() or "application/octet-stream"
+    safe_key_name = _safe_s3_filename(filename)
+
+    username = str(actor.get("username") or "")
+    user_id_uuid = None
+    try:
+        if str(actor.get("id") or "").strip() and str(actor.get("id")) not in {"disabled", "api_key", "startup"}:
+            user_id_uuid = uuid.UUID(str(actor.get("id")))
+    except Exception:
+        user_id_uuid = None
+
+    try:
+        s3_cfg = get_s3_config()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"S3 not configured for documents: {e}")
+
+    await db.run_blocking(db.release_request_connection)
+    digest, size, data, staging_key = await _documents_stream_upload(
+        file, s3_cfg=s3_cfg, content_type=content_type, max_bytes=_docs_max_upload_bytes()
+    )
+    if not size:
+        raise HTTPException(status_code=400, detail="empty file")
+
+    # Look up, upload, then write the row: the request's connection is released before any S3 call.
+    try:
+        doc_id, exists, s3_key = await db.run_blocking(
+            _documents_lookup_for_upload,
+            folder=folder_s,
+            filename=filename,
+            overwrite=overwrite_b,
+            s3_bucket=s3_cfg.bucket,
+            digest=digest,
+            content_type=content_type,
+        )
+        if not s3_key:
+            # New content: store it once under its content address; identical re-uploads skip the PUT.
+            await db.run_blocking(db.release_request_connection)
+            s3_key = blob_key(prefix=s3_cfg.prefix, digest=digest, content_type=content_type)
+            if staging_key:
+                await asyncio.to_thread(
+                    copy_object,
+                    region=s3_cfg.region,
+                    bucket=s3_cfg.bucket,
+                    src_key=staging_key,
+                    dest_key=s3_key,
+                    content_type=content_type,
+                    cache_control=IMMUTABLE_CACHE_CONTROL,
+                )
+            else:
+                await put_bytes_async(
+                    region=s3_cfg.region,
+                    bucket=s3_cfg.bucket,
+                    key=s3_key,
+                    body=data,
+                    content_type=content_type,
+                    cache_control=IMMUTABLE_CACHE_CONTROL,
+                )
+    finally:
+        if staging_key:
+            try:
+                await asyncio.to_thread(delete_object, region=s3_cfg.region, bucket=s3_cfg.bucket, key=staging_key)
+            except Exception:
+                pass
+    await db.run_blocking(
+        _documents_save_upload_row,
+        doc_id=doc_id,
+        exists=exists,
+        folder=folder_s,
+        app_key=app_key_s,
+        group_key=group_key_s,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        digest=digest,
+        status=status_s,
+        notes=notes_s,
+        s3_bucket=s3_cfg.bucket,
+        s3_key=s3_key,
+        user_id=user_id_uuid,
+        username=username,
+        ref_name=f"{s3_cfg.prefix}{_docs_s3_prefix()}{folder_s}/{doc_id}/{safe_key_name}",
+    )
+
     # If the browser submitted the HTML form directly (no JS), redirect back to the UI.
     accept = (request.headers.get("accept") or "").lower()
     if "text/html" in accept:
@@ -11601,7 +13671,7 @@ async def documents_upload(
             "app_key": app_key_s,
             "group_key": group_key_s,
             "filename": filename,
-            "bytes": len(data),
+            "bytes": size,
             "sha256": digest,
             "storage": "s3",
             "s3_bucket": s3_cfg.bucket,
@@ -12180,6 +14250,21 @@ _SCHEMA_STATEMENTS: list[str] = [
 ]
 
 
+@app.post("/admin/schema/verify")
+def admin_schema_verify(
+    request: Request,
+    x_api_key: str | None = Header(default=None, alias="X-API-Key"),
+) -> dict[str, Any]:
+    """
+    Force re-verification of the schema-readiness registry (e.g. after a manual DB change).
+    """
+    _require_access(request=request, x_api_key=x_api_key, role="admin")
+    try:
+        return _verify_schema(force=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Schema verify failed: {e}") from e
+
+
 @app.post("/admin/schema/init")
 def admin_schema_init(
     request: Request,
@@ -12538,6 +14623,7 @@ def generate_weather_png(
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
 ) -> dict[str, Any]:
     _require_access(request=request, x_api_key=x_api_key, role="editor")
+    db.release_request_connection()
     return _generate_weather_png_for_slug(location_slug=body.location_slug, year=body.year)
 
 
@@ -12814,7 +14900,15 @@ def _auto_generate_one(
     )
 
 
-def _run_weather_auto_batch(*, locations: list[str], force_refresh: bool, job_id: str | None = None) -> dict[str, Any]:
+def _run_weather_auto_batch(
+    *, locations: list[str], force_refresh: bool, job_id: str | None = None, outcomes: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """
+    Generate weather + daylight for each location and record one combined usage row per provider.
+
+    `outcomes` (location -> per-location output, or {"error": ...}) comes from fanned-out child
+    jobs; those locations aren't generated again here, only aggregated.
+    """
     locations = [str(x).strip() for x in (locations or []) if str(x).strip()]
     if not locations:
         raise HTTPException(status_code=400, detail="Provide at least one location")
@@ -12834,18 +14928,35 @@ def _run_weather_auto_batch(*, locations: list[str], force_refresh: bool, job_id
     openai_daylight_total = 0
     openai_daylight_model = ""
 
+    # A resumed job (see `_reap_stale_jobs`) reuses locations that already finished.
+    done = outcomes if outcomes is not None else _job_checkpoints(job_id, step="location")
+
     for i, q in enumerate(locations, start=1):
         if job_id:
             try:
                 with _connect() as conn:
                     with conn.cursor() as cur:
-                        _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(locations)}] {q}")
+                        suffix = " (done)" if q in done else ""
+                        _job_append_log(cur, job_id=job_id, line=f"[{i}/{len(locations)}] {q}{suffix}")
                     conn.commit()
             except Exception:
                 pass
 
         try:
-            res, tok, model, wtok, wmodel, dtok, dmodel = _auto_generate_one(location_query=q, force_refresh=force_refresh)
+            if q in done:
+                c = done[q]
+                if c.get("error"):
+                    raise RuntimeError(str(c["error"]))
+                res, tok, model = c["res"], c["tok"], c["model"]
+                wtok, wmodel, dtok, dmodel = c["wtok"], c["wmodel"], c["dtok"], c["dmodel"]
+            else:
+                res, tok, model, wtok, wmodel, dtok, dmodel = _auto_generate_one(location_query=q, force_refresh=force_refresh)
+                _job_checkpoint(
+                    job_id,
+                    step="location",
+                    item=q,
+                    result={"res": res, "tok": tok, "model": model, "wtok": wtok, "wmodel": wmodel, "dtok": dtok, "dmodel": dmodel},
+                )
             results.append(res)
             perplexity_prompt += int(tok.get("prompt_tokens") or 0)
             perplexity_completion += int(tok.get("completion_tokens") or 0)
@@ -12961,16 +15072,21 @@ def auto_weather_batch(
     x_api_key: str | None = Header(default=None, alias="X-API-Key"),
     enqueue: bool = Query(default=False),
 ) -> dict[str, Any]:
-    _require_access(request=request, x_api_key=x_api_key, role="editor")
+    user = _require_access(request=request, x_api_key=x_api_key, role="editor")
 
     locations = [str(x).strip() for x in (body.locations or []) if str(x).strip()]
     if not locations:
         raise HTTPException(status_code=400, detail="Provide at least one location")
 
     if enqueue:
-        job_id = _enqueue_job(kind="weather_auto_batch", payload={"locations": locations, "force_refresh": bool(body.force_refresh)})
+        job_id = _enqueue_job(
+            kind="weather_auto_batch",
+            payload={"locations": locations, "force_refresh": bool(body.force_refresh)},
+            created_by=str(user.get("username") or ""),
+        )
         return {"ok": True, "enqueued": True, "job_id": job_id, "job_url": f"/jobs/ui?job_id={job_id}"}
 
+    db.release_request_connection()
     return _run_weather_auto_batch(locations=locations, force_refresh=bool(body.force_refresh))
 
 
@@ -0,0 +1,23 @@
+-- 0008_artifacts.sql
+-- Content-addressed blob registry (one S3 object per sha256) plus logical-name pointers.
+
+CREATE TABLE IF NOT EXISTS "__OPS_SCHEMA__".artifacts (
+  sha256 TEXT NOT NULL,
+  s3_bucket TEXT NOT NULL,
+  s3_key TEXT NOT NULL,
+  bytes BIGINT NOT NULL DEFAULT 0,
+  content_type TEXT NOT NULL DEFAULT '',
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (s3_bucket, sha256)
+);
+
+CREATE TABLE IF NOT EXISTS "__OPS_SCHEMA__".artifact_refs (
+  name TEXT PRIMARY KEY, -- logical name, e.g. '<prefix><slug>/weather/2026.png'
+  sha256 TEXT NOT NULL,
+  s3_bucket TEXT NOT NULL,
+  s3_key TEXT NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS artifact_refs_sha256_idx
+  ON "__OPS_SCHEMA__".artifact_refs(sha256);
@@ -0,0 +1,10 @@
+-- 0009_job_log_lines.sql
+-- Append-only job log (replaces rewriting jobs.log on every line; jobs.log is kept for older jobs).
+
+CREATE TABLE IF NOT EXISTS "__OPS_SCHEMA__".job_log_lines (
+  job_id UUID NOT NULL REFERENCES "__OPS_SCHEMA__".jobs(id) ON DELETE CASCADE,
+  seq INTEGER NOT NULL,
+  ts TIMESTAMPTZ NOT NULL DEFAULT now(),
+  line TEXT NOT NULL,
+  PRIMARY KEY (job_id, seq)
+);
@@ -0,0 +1,17 @@
+-- 0010_job_checkpoints.sql
+-- Per-item progress for resumable jobs, plus an attempt counter for the stale-job reaper.
+
+ALTER TABLE "__OPS_SCHEMA__".jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS "__OPS_SCHEMA__".job_checkpoints (
+  job_id UUID NOT NULL REFERENCES "__OPS_SCHEMA__".jobs(id) ON DELETE CASCADE,
+  step TEXT NOT NULL,  -- e.g. 'location', 'prepare', 'generate'
+  item TEXT NOT NULL,  -- location query / activity_id
+  result JSONB NOT NULL DEFAULT '{}'::jsonb,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (job_id, step, item)
+);
+
+CREATE INDEX IF NOT EXISTS jobs_running_heartbeat_idx
+  ON "__OPS_SCHEMA__".jobs(heartbeat_at)
+  WHERE status = 'running';
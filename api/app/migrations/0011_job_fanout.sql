@@ -0,0 +1,10 @@
+-- 0011_job_fanout.sql
+-- Parent/child jobs: a batch parent spawns one child per item, sits in status 'waiting',
+-- and is requeued to aggregate once every child has finished.
+
+ALTER TABLE "__OPS_SCHEMA__".jobs
+  ADD COLUMN IF NOT EXISTS parent_id UUID REFERENCES "__OPS_SCHEMA__".jobs(id) ON DELETE CASCADE;
+
+CREATE INDEX IF NOT EXISTS jobs_parent_id_idx
+  ON "__OPS_SCHEMA__".jobs(parent_id)
+  WHERE parent_id IS NOT NULL;
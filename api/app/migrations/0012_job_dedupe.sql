@@ -0,0 +1,13 @@
+-- 0012_job_dedupe.sql
+-- Idempotent enqueue: at most one in-flight job per dedupe key (kind + normalized payload),
+-- plus a lookup index for reusing recently finished results.
+
+ALTER TABLE "__OPS_SCHEMA__".jobs ADD COLUMN IF NOT EXISTS dedupe_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedupe_inflight_uq
+  ON "__OPS_SCHEMA__".jobs(dedupe_key)
+  WHERE dedupe_key IS NOT NULL AND status IN ('queued', 'running', 'waiting');
+
+CREATE INDEX IF NOT EXISTS jobs_dedupe_ok_idx
+  ON "__OPS_SCHEMA__".jobs(dedupe_key, finished_at DESC)
+  WHERE dedupe_key IS NOT NULL AND status = 'ok';
@@ -0,0 +1,14 @@
+-- 0013_job_priority.sql
+-- Job priorities + per-user fair claiming. The claim query reads queued jobs per created_by in
+-- (priority, age) order and running counts per kind/user, both from partial indexes.
+
+ALTER TABLE "__OPS_SCHEMA__".jobs ADD COLUMN IF NOT EXISTS priority SMALLINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS jobs_queued_claim_idx
+  ON "__OPS_SCHEMA__".jobs(created_by, priority DESC, created_at ASC)
+  INCLUDE (kind)
+  WHERE status = 'queued';
+
+CREATE INDEX IF NOT EXISTS jobs_running_kind_user_idx
+  ON "__OPS_SCHEMA__".jobs(kind, created_by)
+  WHERE status = 'running';
@@ -0,0 +1,37 @@
+-- 0014_job_archive.sql
+-- Retention: finished jobs older than JOBS_RETENTION_DAYS move to jobs_archive as compact summaries
+-- (their log lines, checkpoints and fan-out children are dropped with them).
+
+CREATE TABLE IF NOT EXISTS "__OPS_SCHEMA__".jobs_archive (
+  id UUID PRIMARY KEY,
+  kind TEXT NOT NULL,
+  status TEXT NOT NULL,
+  created_by TEXT NOT NULL DEFAULT '',
+  payload_summary JSONB NOT NULL DEFAULT '{}'::jsonb,
+  result_summary JSONB NOT NULL DEFAULT '{}'::jsonb,
+  error TEXT NOT NULL DEFAULT '',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  children INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ NOT NULL,
+  started_at TIMESTAMPTZ,
+  finished_at TIMESTAMPTZ,
+  archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS jobs_archive_created_at_idx
+  ON "__OPS_SCHEMA__".jobs_archive(created_at DESC);
+
+-- Retention sweep: oldest finished top-level jobs first.
+CREATE INDEX IF NOT EXISTS jobs_finished_top_idx
+  ON "__OPS_SCHEMA__".jobs(finished_at)
+  WHERE parent_id IS NULL AND status IN ('ok', 'error', 'cancelled');
+
+-- /jobs/ui listing (children are reached through their parent).
+CREATE INDEX IF NOT EXISTS jobs_top_created_at_idx
+  ON "__OPS_SCHEMA__".jobs(created_at DESC)
+  WHERE parent_id IS NULL;
+
+-- Claims use jobs_queued_claim_idx; this one serves queue-depth/age checks.
+CREATE INDEX IF NOT EXISTS jobs_queued_created_at_idx
+  ON "__OPS_SCHEMA__".jobs(created_at)
+  WHERE status = 'queued';
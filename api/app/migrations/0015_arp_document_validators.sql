@@ -0,0 +1,6 @@
+-- 0015_arp_document_validators.sql
+-- HTTP validators from the last successful fetch so re-checks can use conditional GETs (304 = unchanged).
+
+ALTER TABLE "__ARP_SCHEMA__".documents ADD COLUMN IF NOT EXISTS etag TEXT NOT NULL DEFAULT '';
+ALTER TABLE "__ARP_SCHEMA__".documents ADD COLUMN IF NOT EXISTS last_modified TEXT NOT NULL DEFAULT '';
+ALTER TABLE "__ARP_SCHEMA__".documents ADD COLUMN IF NOT EXISTS checked_at TIMESTAMPTZ;
@@ -0,0 +1,12 @@
+-- 0016_arp_chunk_search.sql
+-- Persisted full-text index over ARP chunks (heading weighted above body). The generated column is
+-- maintained by Postgres whenever prepare upserts chunks, so retrieval never rebuilds an index.
+
+ALTER TABLE "__ARP_SCHEMA__".chunks
+  ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english'::regconfig, coalesce(heading, '')), 'A')
+    || setweight(to_tsvector('english'::regconfig, coalesce(text, '')), 'B')
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS arp_chunks_tsv_idx
+  ON "__ARP_SCHEMA__".chunks USING GIN (tsv);
@@ -0,0 +1,12 @@
+-- 0017_artifact_mime.sql
+-- Blob identity includes the normalized MIME type, so identical bytes stored as different types
+-- (e.g. text/plain vs text/markdown) get their own object and are served with their own Content-Type.
+
+ALTER TABLE "__OPS_SCHEMA__".artifacts ADD COLUMN IF NOT EXISTS mime TEXT NOT NULL DEFAULT '';
+
+UPDATE "__OPS_SCHEMA__".artifacts
+SET mime = COALESCE(NULLIF(lower(btrim(split_part(content_type, ';', 1))), ''), 'application/octet-stream')
+WHERE mime = '';
+
+ALTER TABLE "__OPS_SCHEMA__".artifacts DROP CONSTRAINT IF EXISTS artifacts_pkey;
+ALTER TABLE "__OPS_SCHEMA__".artifacts ADD PRIMARY KEY (s3_bucket, sha256, mime);
@@ -0,0 +1,14 @@
+-- 0018_job_log_seq.sql
+-- Per-job log line counter: seq numbers are allocated on the job row at insert time, so every
+-- process logging to a job (worker, reaper, web instance) gets distinct, ordered seqs.
+
+ALTER TABLE "__OPS_SCHEMA__".jobs ADD COLUMN IF NOT EXISTS log_seq INTEGER NOT NULL DEFAULT 0;
+
+UPDATE "__OPS_SCHEMA__".jobs j
+SET log_seq = m.max_seq
+FROM (
+  SELECT job_id, MAX(seq) AS max_seq
+  FROM "__OPS_SCHEMA__".job_log_lines
+  GROUP BY job_id
+) m
+WHERE m.job_id = j.id AND j.log_seq < m.max_seq;
@@ -2,12 +2,27 @@
 # Scope: internal-api shared (asset storage for internal apps).
 # Dependencies: boto3 (AWS S3).
 # Notes: Requires AWS_REGION, S3_BUCKET; S3_PREFIX is optional.
+#        `*_async` wrappers run the blocking boto3 call in a worker thread for `async def` handlers.
+#        One boto3 client per region is cached and shared (boto3 clients are thread-safe); pool size,
+#        retries and timeouts come from S3_MAX_POOL_CONNECTIONS / S3_MAX_ATTEMPTS / S3_*_TIMEOUT_SECONDS.
+#        Presigned GET URLs are cached per (bucket, key, disposition, content-type) and reused until
+#        S3_PRESIGN_MARGIN_SECONDS before they expire.
+#        `MultipartUpload` lets callers stream large bodies part-by-part with bounded memory.
 from __future__ import annotations
 
+import asyncio
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+from urllib.parse import quote
 
 import boto3
+from botocore.config import Config
+
+from app.cache import TTLCache
 
 
 @dataclass(frozen=True)
@@ -32,19 +47,180 @@ def get_s3_config() -> S3Config:
     return S3Config(region=region, bucket=bucket, prefix=prefix)
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _client_config() -> Config:
+    return Config(
+        max_pool_connections=max(1, _env_int("S3_MAX_POOL_CONNECTIONS", 32)),
+        retries={"max_attempts": max(1, _env_int("S3_MAX_ATTEMPTS", 4)), "mode": "standard"},
+        connect_timeout=max(0.5, _env_float("S3_CONNECT_TIMEOUT_SECONDS", 5.0)),
+        read_timeout=max(1.0, _env_float("S3_READ_TIMEOUT_SECONDS", 60.0)),
+        tcp_keepalive=True,
+    )
+
+
+_CLIENTS: dict[str, Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
 def s3_client(*, region: str):
-    return boto3.client("s3", region_name=region)
+    """
+    Shared client for `region`. Creating a client resolves credentials and loads endpoint
+    data, so it's done once per process; the client's urllib3 pool keeps TLS connections warm.
+    """
+    client = _CLIENTS.get(region)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(region)
+        if client is None:
+            # Client creation goes through a Session, which isn't thread-safe; hence the lock.
+            client = boto3.session.Session().client("s3", region_name=region, config=_client_config())
+            _CLIENTS[region] = client
+        return client
+
+
+class _S3Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ops: dict[str, dict[str, float]] = {}
+
+    def record(self, op: str, *, elapsed_ms: float, bytes_in: int = 0, bytes_out: int = 0, error: bool = False) -> None:
+        with self._lock:
+            m = self._ops.setdefault(
+                op, {"calls": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            m["calls"] += 1
+            m["errors"] += 1 if error else 0
+            m["bytes_in"] += bytes_in
+            m["bytes_out"] += bytes_out
+            m["total_ms"] += elapsed_ms
+            m["max_ms"] = max(m["max_ms"], elapsed_ms)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            out: dict[str, Any] = {}
+            for op, m in sorted(self._ops.items()):
+                calls = int(m["calls"])
+                out[op] = {
+                    "calls": calls,
+                    "errors": int(m["errors"]),
+                    "bytes_in": int(m["bytes_in"]),
+                    "bytes_out": int(m["bytes_out"]),
+                    "avg_ms": round(m["total_ms"] / calls, 2) if calls else 0.0,
+                    "max_ms": round(m["max_ms"], 2),
+                }
+            return out
+
+
+_METRICS = _S3Metrics()
+
+
+@contextmanager
+def _timed(op: str, *, bytes_out: int = 0) -> Iterator[dict[str, int]]:
+    """
+    Records one S3 call. The body may set `acc["bytes_in"]` once the response size is known.
+    """
+    acc = {"bytes_in": 0}
+    t0 = time.perf_counter()
+    error = False
+    try:
+        yield acc
+    except Exception:
+        error = True
+        raise
+    finally:
+        _METRICS.record(
+            op,
+            elapsed_ms=(time.perf_counter() - t0) * 1000.0,
+            bytes_in=acc["bytes_in"],
+            bytes_out=bytes_out,
+            error=error,
+        )
+
+
+def s3_stats() -> dict[str, Any]:
+    """
+    Per-operation call counts, bytes and latency for this process (no secrets).
+    """
+    with _CLIENTS_LOCK:
+        regions = sorted(_CLIENTS)
+    cfg = _client_config()
+    return {
+        "regions": regions,
+        "max_pool_connections": cfg.max_pool_connections,
+        "max_attempts": (cfg.retries or {}).get("max_attempts"),
+        "connect_timeout": cfg.connect_timeout,
+        "read_timeout": cfg.read_timeout,
+        "ops": _METRICS.snapshot(),
+        "presign_cache": _PRESIGN_CACHE.stats(),
+    }
+
+
+_PRESIGN_CACHE: TTLCache[str] = TTLCache(max_items=_env_int("S3_PRESIGN_CACHE_MAX", 20000), ttl_seconds=0)
+
+
+def _presign_margin_seconds() -> int:
+    return max(0, _env_int("S3_PRESIGN_MARGIN_SECONDS", 300))
+
+
+def _presign_cached(*, region: str, params: dict[str, str], expires_in: int) -> str:
+    cache_key = (
+        region,
+        params["Bucket"],
+        params["Key"],
+        params.get("ResponseContentDisposition", ""),
+        params.get("ResponseContentType", ""),
+        int(expires_in),
+    )
+    url = _PRESIGN_CACHE.get(cache_key)
+    if url is not None:
+        return url
+    client = s3_client(region=region)
+    with _timed("presign"):
+        url = client.generate_presigned_url(ClientMethod="get_object", Params=params, ExpiresIn=expires_in)
+    # Reuse only while the URL has at least the margin left; short-lived URLs are never cached.
+    _PRESIGN_CACHE.set(cache_key, url, ttl_seconds=int(expires_in) - _presign_margin_seconds())
+    return url
+
+
+def presign_many(
+    *, region: str, objects: Iterable[tuple[str, str]], expires_in: int = 3600
+) -> dict[tuple[str, str], str]:
+    """
+    Pre-sign GET URLs for a page of (bucket, key) pairs in one pass. Returns {(bucket, key): url};
+    pairs with an empty key are skipped. Warm entries come straight from the cache; misses are
+    signed locally with the shared client (no network round trips).
+    """
+    out: dict[tuple[str, str], str] = {}
+    for bucket, key in objects:
+        if bucket and key and (bucket, key) not in out:
+            out[(bucket, key)] = _presign_cached(region=region, params={"Bucket": bucket, "Key": key}, expires_in=expires_in)
+    return out
 
 
 def put_png(*, region: str, bucket: str, key: str, body: bytes) -> None:
     client = s3_client(region=region)
-    client.put_object(
-        Bucket=bucket,
-        Key=key,
-        Body=body,
-        ContentType="image/png",
-        CacheControl="public, max-age=31536000",
-    )
+    with _timed("put_object", bytes_out=len(body)):
+        client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=body,
+            ContentType="image/png",
+            CacheControl="public, max-age=31536000",
+        )
 
 
 def put_bytes(*, region: str, bucket: str, key: str, body: bytes, content_type: str, cache_control: str = "") -> None:
@@ -52,18 +228,102 @@ def put_bytes(*, region: str, bucket: str, key: str, body: bytes, content_type:
     kwargs = {"Bucket": bucket, "Key": key, "Body": body, "ContentType": content_type or "application/octet-stream"}
     if cache_control:
         kwargs["CacheControl"] = cache_control
-    client.put_object(**kwargs)
+    with _timed("put_object", bytes_out=len(body)):
+        client.put_object(**kwargs)
 
 
-def presign_get(*, region: str, bucket: str, key: str, expires_in: int = 3600) -> str:
-    client = s3_client(region=region)
-    return client.generate_presigned_url(
-        ClientMethod="get_object",
-        Params={"Bucket": bucket, "Key": key},
-        ExpiresIn=expires_in,
+async def put_bytes_async(
+    *, region: str, bucket: str, key: str, body: bytes, content_type: str, cache_control: str = ""
+) -> None:
+    await asyncio.to_thread(
+        put_bytes, region=region, bucket=bucket, key=key, body=body, content_type=content_type, cache_control=cache_control
     )
 
 
+MULTIPART_MIN_PART_BYTES = 5 * 1024 * 1024
+
+
+class MultipartUpload:
+    """
+    Thin wrapper over S3 multipart upload. Parts may be uploaded from several threads;
+    `complete()` orders them by part number.
+    """
+
+    def __init__(self, *, region: str, bucket: str, key: str, content_type: str, cache_control: str = "") -> None:
+        self.region = region
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type or "application/octet-stream"
+        self.cache_control = cache_control
+        self.upload_id = ""
+        self._parts: dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        kwargs: dict[str, Any] = {"Bucket": self.bucket, "Key": self.key, "ContentType": self.content_type}
+        if self.cache_control:
+            kwargs["CacheControl"] = self.cache_control
+        with _timed("create_multipart_upload"):
+            resp = s3_client(region=self.region).create_multipart_upload(**kwargs)
+        self.upload_id = str(resp["UploadId"])
+
+    def upload_part(self, part_number: int, body: bytes) -> None:
+        with _timed("upload_part", bytes_out=len(body)):
+            resp = s3_client(region=self.region).upload_part(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=body
+            )
+        with self._lock:
+            self._parts[part_number] = str(resp["ETag"])
+
+    def complete(self) -> None:
+        with self._lock:
+            parts = [{"PartNumber": n, "ETag": etag} for n, etag in sorted(self._parts.items())]
+        with _timed("complete_multipart_upload"):
+            s3_client(region=self.region).complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+            )
+
+    def abort(self) -> None:
+        if not self.upload_id:
+            return
+        with _timed("abort_multipart_upload"):
+            s3_client(region=self.region).abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def copy_object(
+    *, region: str, bucket: str, src_key: str, dest_key: str, content_type: str, cache_control: str = ""
+) -> None:
+    """
+    Server-side copy within `bucket` (objects up to 5 GB), replacing metadata.
+    """
+    kwargs: dict[str, Any] = {
+        "Bucket": bucket,
+        "Key": dest_key,
+        "CopySource": {"Bucket": bucket, "Key": src_key},
+        "ContentType": content_type or "application/octet-stream",
+        "MetadataDirective": "REPLACE",
+    }
+    if cache_control:
+        kwargs["CacheControl"] = cache_control
+    with _timed("copy_object"):
+        s3_client(region=region).copy_object(**kwargs)
+
+
+def delete_object(*, region: str, bucket: str, key: str) -> None:
+    with _timed("delete_object"):
+        s3_client(region=region).delete_object(Bucket=bucket, Key=key)
+
+
+def presign_get(*, region: str, bucket: str, key: str, expires_in: int = 3600, filename: str = "") -> str:
+    """
+    Pre-signed GET URL. With `filename`, S3 is asked to serve it as an attachment under that name.
+    """
+    params: dict[str, str] = {"Bucket": bucket, "Key": key}
+    if filename:
+        params["ResponseContentDisposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return _presign_cached(region=region, params=params, expires_in=expires_in)
+
+
 def get_bytes(*, region: str, bucket: str, key: str, max_bytes: int = 2 * 1024 * 1024) -> bytes:
     """
     Download an object from S3, enforcing a maximum size.
@@ -72,16 +332,26 @@ def get_bytes(*, region: str, bucket: str, key: str, max_bytes: int = 2 * 1024 *
     pre-signed URL isn't sufficient.
     """
     client = s3_client(region=region)
-    obj = client.get_object(Bucket=bucket, Key=key)
-    body = obj.get("Body")
-    if body is None:
-        return b""
-    data = body.read(max_bytes + 1)
+    with _timed("get_object") as acc:
+        obj = client.get_object(Bucket=bucket, Key=key)
+        body = obj.get("Body")
+        if body is None:
+            return b""
+        try:
+            data = body.read(max_bytes + 1)
+        finally:
+            # Return the connection to the pool even when we stop reading early.
+            body.close()
+        acc["bytes_in"] = len(data)
     if len(data) > max_bytes:
         raise RuntimeError("Object too large to preview")
     return data
 
 
+async def get_bytes_async(*, region: str, bucket: str, key: str, max_bytes: int = 2 * 1024 * 1024) -> bytes:
+    return await asyncio.to_thread(get_bytes, region=region, bucket=bucket, key=key, max_bytes=max_bytes)
+
+
 def presign_get_inline(
     *,
     region: str,
@@ -96,10 +366,9 @@ def presign_get_inline(
 
     Note: this is a hint; the browser may still download for unknown types.
     """
-    client = s3_client(region=region)
     params: dict[str, str] = {"Bucket": bucket, "Key": key}
     if filename:
         params["ResponseContentDisposition"] = f'inline; filename="{filename}"'
     if content_type:
         params["ResponseContentType"] = content_type
-    return client.generate_presigned_url(ClientMethod="get_object", Params=params, ExpiresIn=expires_in)
+    return _presign_cached(region=region, params=params, expires_in=expires_in)
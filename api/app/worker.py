@@ -0,0 +1,83 @@
+# Purpose: Standalone background-jobs worker process (claim/run loop outside the web server).
+# Scope: internal-api jobs (`OPS_SCHEMA.jobs`); run alongside `uvicorn app.main:app` with JOBS_WORKER_MODE=external.
+# Dependencies: app.main (job handlers, claim loop), app.db (pool).
+# Notes: Chart rendering, PDF parsing and LLM calls hold the GIL; running them here keeps request handling responsive.
+"""
+Run job workers in their own process.
+
+Usage (from api/):
+  JOBS_WORKER_MODE=external uvicorn app.main:app --host 0.0.0.0 --port $PORT   # web: enqueue only
+  python -m app.worker [--workers N]                                          # workers
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import threading
+
+from app import db
+from app.main import (
+    _arp_upload_concurrency,
+    _env_float,
+    _env_int,
+    _flush_job_logs,
+    _jobs_worker_count,
+    _start_jobs_workers,
+    _stop_jobs_background,
+    _stop_jobs_workers,
+    _verify_schema,
+)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.worker", description="Run ETI360 background job workers.")
+    parser.add_argument("--workers", type=int, default=0, help="worker threads (default: JOBS_WORKERS)")
+    args = parser.parse_args(argv)
+
+    workers = max(1, min(int(args.workers or _jobs_worker_count()), 32))
+    # Size this process's pool for everything in it that borrows connections, not for web traffic:
+    # job workers, the heartbeat/reaper thread, the job-log flusher and ARP background uploads.
+    needed = workers + 2 + _arp_upload_concurrency()
+    pool_max = _env_int("JOBS_DB_POOL_MAX_SIZE", 0)
+    if 0 < pool_max < needed:
+        print(
+            f"[worker] JOBS_DB_POOL_MAX_SIZE={pool_max} is below the {needed} connections this process can use "
+            f"({workers} workers + heartbeat + log flusher + {_arp_upload_concurrency()} ARP uploads); "
+            "expect pool waits/timeouts"
+        )
+    os.environ["DB_POOL_MAX_SIZE"] = str(pool_max or needed)
+
+    report = _verify_schema()
+    failed = {k: v for k, v in report["steps"].items() if v != "ok"}
+    if failed:
+        print(f"[worker] schema steps failed: {failed}")
+
+    stop = threading.Event()
+
+    def _on_signal(signum: int, _frame: object) -> None:
+        print(f"[worker] received signal {signum}; stopping")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _on_signal)
+    signal.signal(signal.SIGINT, _on_signal)
+
+    _start_jobs_workers(workers)
+    print(f"[worker] started {workers} job workers (pid={os.getpid()})")
+    stop.wait()
+
+    still_running = _stop_jobs_workers(timeout=_env_float("JOBS_SHUTDOWN_GRACE_SECONDS", 30.0))
+    if still_running:
+        print(f"[worker] exiting with {len(still_running)} running jobs; the reaper will requeue them: {still_running}")
+    # Heartbeat/reaper and log flusher must be gone before the pool closes, or their next tick reopens it.
+    _stop_jobs_background(timeout=_env_float("JOBS_SHUTDOWN_GRACE_SECONDS", 30.0))
+    try:
+        _flush_job_logs()
+    except Exception as e:
+        print(f"[worker] job log flush skipped: {e}")
+    db.close_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
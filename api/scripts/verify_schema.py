@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Force re-verification of the API's schema-readiness registry from a shell.
+
+Usage (from api/):
+  PYTHONPATH=. python scripts/verify_schema.py
+"""
+from __future__ import annotations
+
+import json
+
+from app.main import _verify_schema
+
+
+def main() -> None:
+    report = _verify_schema(force=True)
+    print(json.dumps(report, indent=2))
+    if not report.get("ok"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()